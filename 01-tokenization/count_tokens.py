@@ -0,0 +1,46 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.tokens import DEFAULT_MODEL, TokenCounter
+
+# Count tokens for whole corpora instead of one hard-coded string.
+#
+#   python 01-tokenization/count_tokens.py docs/ data.jsonl manual.pdf --threads 16
+#
+# .jsonl files are read line by line (the "text" field), PDFs page by page and
+# every other text file as one document.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count tokens in text, JSONL and PDF corpora.")
+    parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model or encoding name (default: gpt-4o)")
+    parser.add_argument("--threads", type=int, default=8, help="Encoder threads per batch")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Documents per encode batch")
+    parser.add_argument("--text-key", default="text", help="Field holding the text in JSONL records")
+    parser.add_argument("--per-file", action="store_true", help="Also report counts for each file")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    counter = TokenCounter(model=args.model, num_threads=args.threads, batch_size=args.batch_size)
+    stats = counter.count_corpus(args.paths, text_key=args.text_key, per_file=args.per_file)
+
+    if args.json:
+        print(json.dumps(stats.as_dict(), indent=2))
+        return
+
+    for path, file_stats in stats.per_file.items():
+        print(f"  📄 {path} : {file_stats['documents']} docs, {file_stats['tokens']:,} tokens")
+
+    print(f"Files     : {stats.files}")
+    print(f"Documents : {stats.documents:,}")
+    print(f"Tokens    : {stats.tokens:,}")
+    print(f"Time      : {stats.seconds:.2f}s ({stats.tokens_per_second:,.0f} tokens/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,35 @@
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
 
-load_dotenv() 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.embeddings import EmbeddingCache, EmbeddingClient, openai_embed_fn
+from common.providers import HashingEmbeddings, embedding_cache_key, use_fake_embeddings
 
-client = OpenAI()
+load_dotenv() 
 
-text = "dog and cat"
+if use_fake_embeddings():
+    # EMBEDDING_PROVIDER=fake : deterministic hashing embedder, no API key needed
+    embed_fn = HashingEmbeddings(dim=1536).embed_documents
+else:
+    client = OpenAI()
+    embed_fn = openai_embed_fn(client, model="text-embedding-3-small")
 
-response = client.embeddings.create(
-    model="text-embedding-3-small",
-    input=text
+# Batches, de-duplicates and caches on disk, so running this twice costs one API call.
+embedder = EmbeddingClient(
+    embed_fn,
+    model=embedding_cache_key("text-embedding-3-small"),
+    batch_size=2048,
+    cache=EmbeddingCache(Path(__file__).parent / ".cache" / "embeddings.sqlite")
 )
 
-print(response)
\ No newline at end of file
+texts = ["dog and cat", "cat and dog", "dog and cat"]
+
+vectors = embedder.embed_many(texts)
+
+for text, vector in zip(texts, vectors):
+    print(f"{text!r} -> {len(vector)} dims : {vector[:4]} ...")
+
+print("Stats : ", embedder.stats.as_dict())
@@ -0,0 +1,291 @@
+import os
+import sys
+import ast
+import json
+import time
+import asyncio
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+import google.generativeai as genai
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.providers import get_generative_model, use_fake_llm
+from common.rate_limit import RateLimiter, RetryPolicy, with_retries
+from common.tokens import count_tokens
+
+# Run a whole prompt set through one of the chat scripts' SYSTEM_PROMPTs.
+#
+#   python 03-Hello-world/batch-run.py prompts.jsonl -o answers.jsonl --system 03-Hello-world/chat-01.py
+#   python 03-Hello-world/batch-run.py prompts.jsonl -o answers.jsonl --system 03-Hello-world/chat-02.py \
+#       --examples 03-Hello-world/examples/python-tutor.jsonl --concurrency 32 --rpm 2000 --tpm 4000000
+#   python 03-Hello-world/batch-run.py prompts.jsonl -o cot.jsonl \
+#       --system 03-Hello-world/chat-03-automate.py --prompt-var STREAM_SYSTEM_PROMPT
+#
+# Prompts are JSONL: {"id": ..., "prompt": "..."} per line, or bare strings.
+# The system prompt (and the generation_config of the model built with it) is
+# read out of the chat script's source, not run, so the batch uses exactly the
+# prompt the script does. Prompts are read lazily and served by --concurrency
+# asyncio workers. Every call first reserves a request and its estimated tokens
+# from the --rpm/--tpm token buckets. Calls that are throttled or hit a transient
+# server error are retried with jittered exponential backoff. With --examples,
+# each prompt is embedded in a worker thread (retried the same way) to pick its
+# examples, and prompts that pick the same examples share one model. Each
+# answer is appended to the output the moment it finishes, so output order is
+# completion order; every line carries the prompt's id and input index. The
+# throughput report goes to stdout as JSON.
+
+load_dotenv()
+
+# Distinct few-shot selections whose model is kept for reuse
+MODEL_CACHE_SIZE = 256
+
+
+def _string_value(node, strings: dict) -> str | None:
+    """A string literal, a known string variable or a ``+`` of those; None for anything else."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return strings.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _string_value(node.left, strings), _string_value(node.right, strings)
+        return left + right if left is not None and right is not None else None
+    return None
+
+
+def load_system_prompt(path, name: str = "SYSTEM_PROMPT") -> tuple[str, dict]:
+    """``name`` and the ``generation_config`` of the model it is passed to, read from a script's source."""
+    path = Path(path)
+    if path.suffix != ".py":
+        return path.read_text(encoding="utf-8"), {}
+
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    strings, config = {}, {}
+    for node in tree.body:
+        # Module-level strings, so a prompt built from shared parts ("BASE + RULES") resolves
+        if isinstance(node, ast.Assign):
+            value = _string_value(node.value, strings)
+            if value is not None:
+                strings.update((target.id, value) for target in node.targets if isinstance(target, ast.Name))
+    prompt = strings.get(name)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+            instruction = keywords.get("system_instruction")
+            uses_prompt = instruction is not None and any(isinstance(sub, ast.Name) and sub.id == name
+                                                          for sub in ast.walk(instruction))
+            if uses_prompt and "generation_config" in keywords:
+                config = ast.literal_eval(keywords["generation_config"])
+    if prompt is None:
+        raise ValueError(f"{path} has no {name} string.")
+    return prompt, config
+
+
+def read_prompts(path, text_key: str):
+    with open(path, encoding="utf-8") as f:
+        for index, line in enumerate(line for line in f if line.strip()):
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {text_key: record}
+            yield index, record
+
+
+class BatchStats:
+
+    def __init__(self):
+        self.succeeded = self.failed = self.retries = self.cached = 0
+        self.prompt_tokens = self.output_tokens = 0
+        self.rate_limit_wait = 0.0
+        self.latencies = []
+
+    def as_dict(self, wall: float) -> dict:
+        done = self.succeeded + self.failed
+        stats = {
+            "prompts": done,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retries": self.retries,
+            "cached": self.cached,
+            "wall_seconds": round(wall, 3),
+            "requests_per_second": round(done / wall, 2) if wall else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "tokens_per_second": round((self.prompt_tokens + self.output_tokens) / wall, 1) if wall else 0.0,
+            "rate_limit_wait_seconds": round(self.rate_limit_wait, 3),
+        }
+        if self.latencies:
+            for q in (50, 95, 99):
+                stats[f"latency_ms_p{q}"] = round(float(np.percentile(self.latencies, q)) * 1000, 1)
+        return stats
+
+
+class BatchRunner:
+
+    def __init__(self, args, system_prompt: str, generation_config: dict, examples=None):
+        self.args = args
+        self.system_prompt = system_prompt
+        self.generation_config = generation_config
+        self.examples = examples
+        self.model = self._model(system_prompt)
+        self.limiter = RateLimiter(args.rpm, args.tpm)
+        self.policy = RetryPolicy(max_retries=args.max_retries, base_delay=args.backoff, max_delay=args.max_backoff)
+        self.stats = BatchStats()
+        # Prompts that pick the same examples share one model (and one system prompt)
+        self._models = OrderedDict()
+
+    def _model(self, system_prompt: str):
+        return get_generative_model(model_name=self.args.model, system_instruction=system_prompt,
+                                    generation_config=self.generation_config or None)
+
+    async def _prepare(self, prompt: str):
+        """Model and system prompt for one prompt: with few-shot examples picked for it, if any."""
+        if self.examples is None:
+            return self.model, self.system_prompt
+
+        async def select():
+            # Selecting embeds the prompt: a blocking network call, kept off the event loop and retried
+            return await asyncio.to_thread(self.examples.select, prompt, k=self.args.few_shot_k,
+                                           token_budget=self.args.few_shot_tokens)
+
+        selection = await with_retries(select, self.policy, on_retry=self._on_retry)
+        key = tuple(example.input for example in selection.examples)
+        if key not in self._models:
+            system_prompt = self.system_prompt + "\nExamples:\n" + "\n\n".join(
+                example.as_text() for example in selection.examples)
+            self._models[key] = (self._model(system_prompt), system_prompt)
+            if len(self._models) > MODEL_CACHE_SIZE:
+                self._models.popitem(last=False)
+        else:
+            self._models.move_to_end(key)
+        return self._models[key]
+
+    def _on_retry(self, attempt, error, delay):
+        self.stats.retries += 1
+        print(f"⚠️  {type(error).__name__}, retry {attempt + 1} in {delay:.1f}s", file=sys.stderr)
+
+    async def run_one(self, index: int, record: dict) -> dict:
+        result = {"id": record.get("id", index), "index": index}
+        prompt = record.get(self.args.text_key)
+        if not isinstance(prompt, str):
+            self.stats.failed += 1
+            result["error"] = f"No {self.args.text_key!r} text in the record."
+            return result
+
+        try:
+            model, system_prompt = await self._prepare(prompt)
+        except Exception as e:
+            self.stats.failed += 1
+            result["error"] = f"{type(e).__name__}: {e}"
+            return result
+        prompt_estimate = count_tokens(system_prompt) + count_tokens(prompt)
+        estimate = prompt_estimate + self.args.expected_output_tokens
+
+        async def call():
+            # Every attempt is a request of its own as far as the quota is concerned
+            self.stats.rate_limit_wait += await self.limiter.acquire(estimate)
+            return await model.generate_content_async(prompt)
+
+        started = time.perf_counter()
+        try:
+            response = await with_retries(call, self.policy, on_retry=self._on_retry)
+            text = response.text
+        except Exception as e:
+            self.stats.failed += 1
+            result["error"] = f"{type(e).__name__}: {e}"
+            return result
+        latency = time.perf_counter() - started
+
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or prompt_estimate
+        output_tokens = getattr(usage, "candidates_token_count", None) or count_tokens(text)
+        if getattr(response, "cached", False):
+            # Answered by the LLM_CACHE response cache: nothing counted against the quota
+            self.stats.cached += 1
+            self.limiter.release(estimate)
+        else:
+            self.limiter.settle(estimate, prompt_tokens + output_tokens)
+
+        self.stats.succeeded += 1
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.output_tokens += output_tokens
+        self.stats.latencies.append(latency)
+        result.update(response=text, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                      latency_ms=round(latency * 1000, 1))
+        return result
+
+    async def run(self, prompts, out) -> dict:
+        queue = asyncio.Queue(maxsize=self.args.concurrency * 2)
+        started = time.perf_counter()
+
+        async def produce():
+            for item in prompts:
+                await queue.put(item)
+            for _ in range(self.args.concurrency):
+                await queue.put(None)
+
+        async def work():
+            while (item := await queue.get()) is not None:
+                result = await self.run_one(*item)
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                done = self.stats.succeeded + self.stats.failed
+                if self.args.progress_every and done % self.args.progress_every == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"⏳ {done} done · {done / elapsed:.1f} req/s", file=sys.stderr)
+
+        await asyncio.gather(produce(), *(work() for _ in range(self.args.concurrency)))
+        return self.stats.as_dict(time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL prompt set through a chat script's system prompt.")
+    parser.add_argument("prompts", help="JSONL of {\"id\", \"prompt\"} records or bare strings")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file the answers are appended to")
+    parser.add_argument("--system", required=True, help="Chat script (its SYSTEM_PROMPT is used) or a text file")
+    parser.add_argument("--prompt-var", default="SYSTEM_PROMPT", help="Variable holding the prompt in --system")
+    parser.add_argument("--examples", help="Few-shot JSONL; the closest examples are added per prompt")
+    parser.add_argument("--few-shot-k", type=int, default=int(os.getenv("FEW_SHOT_K", "3")))
+    parser.add_argument("--few-shot-tokens", type=int, default=int(os.getenv("FEW_SHOT_TOKENS", "400")))
+    parser.add_argument("--text-key", default="prompt", help="Field holding the prompt in JSONL records")
+    parser.add_argument("--model", default="gemini-2.0-flash")
+    parser.add_argument("--concurrency", type=int, default=16, help="Calls in flight")
+    parser.add_argument("--rpm", type=float, default=1000, help="Requests per minute, 0 = unlimited")
+    parser.add_argument("--tpm", type=float, default=1_000_000, help="Tokens per minute, 0 = unlimited")
+    parser.add_argument("--expected-output-tokens", type=int, default=256,
+                        help="Output tokens reserved per call until the real usage is known")
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--backoff", type=float, default=1.0, help="First retry's maximum delay in seconds")
+    parser.add_argument("--max-backoff", type=float, default=60.0)
+    parser.add_argument("--progress-every", type=int, default=100, help="Progress line every N answers, 0 = off")
+    args = parser.parse_args()
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key and not use_fake_llm():
+        raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
+    genai.configure(api_key=api_key)
+
+    system_prompt, generation_config = load_system_prompt(args.system, args.prompt_var)
+    examples = None
+    if args.examples:
+        from common.embeddings import cached_langchain_embeddings
+        from common.few_shot import FewShotStore
+        from common.providers import embedding_cache_key, get_embeddings
+
+        examples = FewShotStore.from_jsonl(args.examples, cached_langchain_embeddings(
+            get_embeddings(api_key=api_key),
+            model=embedding_cache_key("models/embedding-001"),
+            cache_path=Path(__file__).parent / ".cache" / "embeddings.sqlite"
+        ))
+
+    runner = BatchRunner(args, system_prompt, generation_config, examples)
+    with open(args.output, "a", encoding="utf-8") as out:
+        report = asyncio.run(runner.run(read_prompts(args.prompts, args.text_key), out))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.providers import get_generative_model, use_fake_llm
+from common.streaming import send_streaming
+
 
 # Load environment variables from .env
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
 # Validate API Key
-if not api_key:
+if not api_key and not use_fake_llm():
     raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
 
 # Configure the genai client
@@ -23,7 +31,7 @@ If user tries to ask something else apart from Python you can just roast them.
 """
 
 # Initialize the model
-model = genai.GenerativeModel(
+model = get_generative_model(
     model_name="gemini-2.0-flash",
     system_instruction=SYSTEM_PROMPT
 )
@@ -51,10 +59,9 @@ chat = model.start_chat(history=[
 
 print("\n\n Chat :  ",chat,"\n\n")
 
-# Send the new message
-response = chat.send_message("write a additio fnction in pythion?")
+# Send the new message; the reply is printed token by token as it arrives (STREAM_OUTPUT=0 to wait for all of it)
+text, timing = send_streaming(chat, "write a additio fnction in pythion?", prefix="🤖 bot:\n ")
 
-# Print the response
-print("🤖 bot:\n", response.text)
+print(timing.summary())
 
 
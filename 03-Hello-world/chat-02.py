@@ -1,13 +1,23 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.embeddings import cached_langchain_embeddings
+from common.few_shot import FewShotStore
+from common.providers import embedding_cache_key, get_embeddings, get_generative_model, use_fake_llm
+from common.streaming import send_streaming
+
 
 # Load environment variables from .env
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
 # Validate API Key
-if not api_key:
+if not api_key and not use_fake_llm():
     raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
 
 # Configure the genai client
@@ -20,24 +30,31 @@ SYSTEM_PROMPT = """
 You are an AI expert in coding. You only know Python and nothing else. 
 You help users in solving their Python doubts only and nothing else. 
 If user tries to ask something else apart from Python you can just roast them.
+"""
 
-Examples:
-User : How to make a Tea?
-MODEL : oh my love ! It seems you don't have girlfriend.
-# What make you think I am a chef you peice of crap.
-
-Examples:
-User : How to write a function in python
-MODEL : def fn_name(x:int)->int:
-            pass # Logic of the function.
-
+# The examples live in examples/python-tutor.jsonl. Only the few closest to the
+# question (within a token budget) go into the prompt, so a growing library
+# doesn't make every request longer.
+FEW_SHOT_K = int(os.getenv("FEW_SHOT_K", "3"))
+FEW_SHOT_TOKENS = int(os.getenv("FEW_SHOT_TOKENS", "400"))
+
+examples = FewShotStore.from_jsonl(
+    Path(__file__).parent / "examples" / "python-tutor.jsonl",
+    cached_langchain_embeddings(
+        get_embeddings(api_key=api_key),   # the GEMINI_API_KEY validated above
+        model=embedding_cache_key("models/embedding-001"),
+        cache_path=Path(__file__).parent / ".cache" / "embeddings.sqlite"
+    )
+)
 
-"""
+query = "what is my name ?"
+selection = examples.select(query, k=FEW_SHOT_K, token_budget=FEW_SHOT_TOKENS)
+print(selection.summary())
 
 # Initialize the model
-model = genai.GenerativeModel(
+model = get_generative_model(
     model_name="gemini-2.0-flash",
-    system_instruction=SYSTEM_PROMPT
+    system_instruction=SYSTEM_PROMPT + "\nExamples:\n" + "\n\n".join(example.as_text() for example in selection.examples)
 )
 
 # Start a chat session
@@ -53,10 +70,9 @@ chat = model.start_chat(history=[
 
 ])
 
-# Send the new message
-response = chat.send_message("what is my name ?")
+# Send the new message; the reply is printed token by token as it arrives (STREAM_OUTPUT=0 to wait for all of it)
+text, timing = send_streaming(chat, query, prefix="🤖 bot:\n ")
 
-# Print the response
-print("🤖 bot:\n", response.text)
+print(timing.summary())
 
 
@@ -1,49 +1,81 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
 import json
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.history import ChatHistory
+from common.providers import get_generative_model, use_fake_llm
+from common.json_stream import iter_objects, read_step
 
 # Load environment variables from .env
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
 # Validate API Key
-if not api_key:
+if not api_key and not use_fake_llm():
     raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
 
 # Configure the genai client
 genai.configure(api_key=api_key)
 
+# STEP_MODE = turns  : one model call per step ("Continue to the next step.") (default)
+#             stream : all steps in one streamed reply, each printed as soon as its line arrives
+STEP_MODE = os.getenv("STEP_MODE", "turns").lower()
+
 
 #******** Chain Of Thought: The model is encouraged to break down reasoning step by step before arriving at an answer. ************
 
-SYSTEM_PROMPT = """
-   You are an helpfull AI assistant who is specialized in resolving user query.
+# Shared by both modes; each mode adds its own rules and example layout below
+BASE_PROMPT = """
+   You are a helpful AI assistant who is specialized in resolving user queries.
     For the given user input, analyse the input and break down the problem step by step.
 
     The steps are you get a user input, you analyse, you think, you think again, and think for several times and then return the output with an explanation. 
 
     Follow the steps in sequence that is "analyse", "think", "output", "validate" and finally "result".
+"""
 
+EXAMPLE_STEPS = """
+    {{ "step": "analyse", "content": "Alright! The user is interested in a maths query and is asking a basic arithmetic operation" }}
+    {{ "step": "think", "content": "To perform this addition, I must go from left to right and add all the operands." }}
+    {{ "step": "output", "content": "4" }}
+    {{ "step": "validate", "content": "Seems like 4 is the correct answer for 2 + 2" }}
+    {{ "step": "result", "content": "2 + 2 = 4 and this is calculated by adding all numbers" }}
+"""
+
+SYSTEM_PROMPT = BASE_PROMPT + """
     Rules:
     1. Follow the strict JSON output as per schema.
     2. Always perform one step at a time and wait for the next input.
-    3. Carefully analyse the user query,
+    3. Carefully analyse the user query.
 
     Output Format:
     {{ "step": "string", "content": "string" }}
 
-    Example:
+    Example (each line is the reply to one turn):
+    Input: What is 2 + 2""" + EXAMPLE_STEPS
+
+
+STREAM_SYSTEM_PROMPT = BASE_PROMPT + """
+    Rules:
+    1. Write all the steps in this one reply as newline-delimited JSON: one JSON object per line, in order.
+    2. Do not wrap the lines in a list or a code block and do not write anything between them.
+    3. Carefully analyse the user query.
+
+    Output Format (one line per step):
+    {{ "step": "string", "content": "string" }}
+
+    Example (the whole reply):
     Input: What is 2 + 2
-    Output: {{ "step": "analyse", "content": "Alight! The user is interest in maths query and he is asking a basic arthematic operation" }}
-    Output: {{ "step": "think", "content": "To perform this addition, I must go from left to right and add all the operands." }}
-    Output: {{ "step": "output", "content": "4" }}
-    Output: {{ "step": "validate", "content": "Seems like 4 is correct ans for 2 + 2" }}
-    Output: {{ "step": "result", "content": "2 + 2 = 4 and this is calculated by adding all numbers" }}
-"""
+    Output:""" + EXAMPLE_STEPS
 
 # Initialize the model
-model = genai.GenerativeModel(
+model = get_generative_model(
     model_name="gemini-1.5-flash",  
     system_instruction=SYSTEM_PROMPT,
     generation_config={
@@ -51,85 +83,111 @@ model = genai.GenerativeModel(
     }
 )
 
+# Plain-text output: a JSON mime type would force the whole reply to be a single JSON value
+stream_model = get_generative_model(
+    model_name="gemini-1.5-flash",
+    system_instruction=STREAM_SYSTEM_PROMPT
+)
+
 
 """ 
 The issue is that chat_history is initialized as an empty list at the beginning and never gets updated. In Google Generative AI, when you use chat.send_message(), the chat object internally maintains its own history, but it doesn't automatically update your chat_history variable.
 """
-chat_history = []
+chat_history = ChatHistory()
 
-# Function to update chat history manually
+# Function to update chat history manually (token counts are memoized per message)
 def update_chat_history(role, content):
-    chat_history.append({"role": role, "parts": [content]})
-
-
-query = input("> ")
-
-# Start chat session with the user query
-chat = model.start_chat(history=chat_history)
-
-try:
-    # Add initial user query to history
-    update_chat_history("user", query)
-    
+    chat_history.append(role, content)
+
+
+NEXT_STEP = "Continue to the next step."
+
+
+def handle_step(parsed_response):
+    """Print one step; returns True once the final result is reached."""
+    if parsed_response.get("step") == "think":
+        print("   🧠 THINK :", parsed_response.get("content"))
+    elif parsed_response.get("step") == "analyse":
+        print("   🔍 ANALYSE :", parsed_response.get("content"))
+    elif parsed_response.get("step") == "output":
+        print("    📤 OUTPUT :", parsed_response.get("content"))
+    elif parsed_response.get("step") == "validate":
+        print("    ✅ VALIDATE :", parsed_response.get("content"))
+    elif parsed_response.get("step") == "result":
+        print("\n\n 🤖 : ", parsed_response.get("content"),"\n\n")
+        return True
+    else:
+        # Handle unexpected steps
+        print(f"          🔄 {parsed_response.get('step', 'unknown').upper()}:", parsed_response.get("content"))
+    return False
+
+
+def run_streamed(query):
+    """All steps from one streamed call; returns (reached the result, raw step lines)."""
+    print(f"      🧮 context : {chat_history.total_tokens} tokens")
+    started = time.perf_counter()
+    response = stream_model.start_chat(history=[]).send_message(query, stream=True)
+    lines = []
+    try:
+        # Each step object is handled the moment it closes, while later steps are still being written
+        for parsed_response in iter_objects(response):
+            lines.append(json.dumps(parsed_response))
+            if handle_step(parsed_response):
+                print(f"      ⏱  {len(lines)} steps in one call · {time.perf_counter() - started:.2f}s")
+                return True, lines
+    except ValueError as e:
+        print(f"❌ JSON Parse Error: {e}")
+    return False, lines
+
+
+def run_step_protocol(chat, query):
+    """One call per step, sending "Continue to the next step." until the result arrives."""
     while True:
         # Send message to Gemini
-        response = chat.send_message(query)
+        print(f"      🧮 context : {chat_history.total_tokens} tokens")
+        reply = read_step(chat.send_message(query, stream=True))
         
         # Add response to history
-        update_chat_history("model", response.text)
+        update_chat_history("model", reply.text)
         
-        # Parse the JSON response
-        try:
-            parsed_response = json.loads(response.text)
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON Parse Error: {e}")
-            print(f"Raw response: {response.text}")
+        # The JSON is parsed as it streams in
+        parsed_response = reply.step
+        if parsed_response is None:
+            print(f"❌ JSON Parse Error: {reply.error}")
+            print(f"Raw response: {reply.text}")
             break
-        
-        # Handle different steps
-        if parsed_response.get("step") == "think":
-            print("   🧠 THINK :", parsed_response.get("content"))           
-            query = "Continue to the next step."
-            update_chat_history("user", query)
-            continue
-            
-        elif parsed_response.get("step") == "analyse":
-            print("   🔍 ANALYSE :", parsed_response.get("content"))
-            query = "Continue to the next step."
-            update_chat_history("user", query)
-            continue
-            
-        elif parsed_response.get("step") == "output":
-            print("    📤 OUTPUT :", parsed_response.get("content"))
-            query = "Continue to the next step."
-            update_chat_history("user", query)
-            continue
-            
-        elif parsed_response.get("step") == "validate":
-            print("    ✅ VALIDATE :", parsed_response.get("content"))
-            query = "Continue to the next step."
-            update_chat_history("user", query)
-            continue
-            
-        elif parsed_response.get("step") == "result":
-            print("\n\n 🤖 : ", parsed_response.get("content"),"\n\n")
-            # print("Internal chat history:", chat.history)
-            # print("\n\n📋 Chat History:")
-            # for i, msg in enumerate(chat_history):
-            #     print(f"{i+1}. {msg['role']}: {msg['parts'][0][:100]}...")  # Truncate long messages
-            break
-            
-        else:
-            # Handle unexpected steps
-            print(f"          🔄 {parsed_response.get('step', 'unknown').upper()}:", parsed_response.get("content"))
-            query = "Continue to the next step."
-            update_chat_history("user", query)
-            continue
 
-except Exception as e:
-    print(f"❌ Error: {e}")
+        if handle_step(parsed_response):
+            break
+        query = NEXT_STEP
+        update_chat_history("user", query)
 
 
+query = input("> ")
 
+try:
+    # Add initial user query to history
+    update_chat_history("user", query)
 
+    if STEP_MODE == "stream":
+        done, lines = run_streamed(query)
+        if not done:
+            # Mixed mode: keep the steps that did arrive and let the step-by-step protocol finish
+            print("      ↩️  falling back to one call per step")
+            if lines:
+                # The question is already answered in part: replay it with the steps received so far
+                history = [{"role": "user", "parts": [query]}, {"role": "model", "parts": ["\n".join(lines)]}]
+                update_chat_history("model", "\n".join(lines))
+                update_chat_history("user", NEXT_STEP)
+                run_step_protocol(model.start_chat(history=history), NEXT_STEP)
+            else:
+                # Nothing arrived: ask the question afresh, so it isn't sent twice in a row
+                run_step_protocol(model.start_chat(history=[]), query)
+        else:
+            update_chat_history("model", "\n".join(lines))
+    else:
+        # Start chat session with the user query
+        run_step_protocol(model.start_chat(history=[]), query)
 
+except Exception as e:
+    print(f"❌ Error: {e}")
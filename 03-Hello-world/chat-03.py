@@ -1,14 +1,22 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
-import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.embeddings import cached_langchain_embeddings
+from common.few_shot import FewShotStore
+from common.providers import embedding_cache_key, get_embeddings, get_generative_model, use_fake_llm
+from common.streaming import send_streaming
 
 # Load environment variables from .env
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
 # Validate API Key
-if not api_key:
+if not api_key and not use_fake_llm():
     raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
 
 # Configure the genai client
@@ -32,18 +40,27 @@ SYSTEM_PROMPT = """
 
     Output Format:
     {{ "step": "string", "content": "string" }}
-
-    Example:
-    Input: What is 2 + 2
-    Output: {{ "step": "analyse", "content": "Alight! The user is interest in maths query and he is asking a basic arthematic operation" }}
-    Output: {{ "step": "think", "content": "To perform this addition, I must go from left to right and add all the operands." }}
-    Output: {{ "step": "output", "content": "4" }}
-    Output: {{ "step": "validate", "content": "Seems like 4 is correct ans for 2 + 2" }}
-    Output: {{ "step": "result", "content": "2 + 2 = 4 and this is calculated by adding all numbers" }}
 """
 
+# Worked examples live in examples/chain-of-thought.jsonl; the closest ones to the
+# question (within a token budget) are replayed as chat history instead of all of them.
+FEW_SHOT_K = int(os.getenv("FEW_SHOT_K", "2"))
+FEW_SHOT_TOKENS = int(os.getenv("FEW_SHOT_TOKENS", "600"))
+
+examples = FewShotStore.from_jsonl(
+    Path(__file__).parent / "examples" / "chain-of-thought.jsonl",
+    cached_langchain_embeddings(
+        get_embeddings(api_key=api_key),   # the GEMINI_API_KEY validated above
+        model=embedding_cache_key("models/embedding-001"),
+        cache_path=Path(__file__).parent / ".cache" / "embeddings.sqlite"
+    )
+)
+
+query = "What is 5/2*3 to the power 4"
+selection = examples.select(query, k=FEW_SHOT_K, token_budget=FEW_SHOT_TOKENS)
+
 # Initialize the model
-model = genai.GenerativeModel(
+model = get_generative_model(
     model_name="gemini-2.0-flash",
     system_instruction=SYSTEM_PROMPT,
     generation_config={
@@ -62,37 +79,15 @@ chat = model.start_chat(history=[
         "parts": ["Hi Pravin, it's nice to meet you! How can I help you today?"]
     },
 
-    # add bot respones
-
-
-    {
-        "role":"model",
-        "parts":[json.dumps({ "step": "analyse","content": "The user is asking to evaluate a mathematical expression that involves division, multiplication inside the parenthesis and then exponentiation. Order of operations (PEMDAS/BODMAS) must be followed to get the correct result."})]
-    }
-    ,
-    {
-        "role":"model",
-        "parts":[json.dumps({"step": "think", "content": "I need to calculate the value of the expression (5/2*3)^4. First, I will perform the operations inside the parentheses from left to right. Then, I will raise the result to the power of 4."})]
-    },
-    {
-        "role":"model",
-        "parts": [ json.dumps({"step": "output", "content": "1.  Calculate 5 / 2 = 2.5\n2.  Calculate 2.5 * 3 = 7.5\n3.  Calculate 7.5 ^ 4 = 3164.0625\n\nTherefore, (5/2*3)^4 = 3164.0625"})]
-    },
-    {
-        "role":"model",
-        "parts":[json.dumps({"step": "validate", "content": "To validate the result, I can use a calculator to evaluate the expression (5/2*3)^4 and see if it matches the calculated value.\n(5/2*3)^4 = (2.5*3)^4 = (7.5)^4 = 3164.0625. The calculated value matches the result of the calculator"} )]
-    },
-    {
-        "role":"model",
-        "parts":[json.dumps({"step": "result", "content": "The value of the expression (5/2*3)^4 is 3164.0625"} )]
-    }
+    # the selected worked examples: question, then one model turn per step
+    *[turn for example in selection.examples for turn in example.as_history()]
 
 ])
 
-# Send the new message
-response = chat.send_message("What is 5/2*3 to the power 4")
+# Send the new message; the reply is printed token by token as it arrives (STREAM_OUTPUT=0 to wait for all of it)
+print(selection.summary(), "\n")
+text, timing = send_streaming(chat, query, prefix="🤖 bot:  ")
 
-# Print the response
-print("\n\n🤖 bot: ", response.text,"\n\n")
+print(timing.summary(), "\n\n")
 
 
@@ -2,15 +2,21 @@ from dotenv import load_dotenv
 import subprocess
 import google.generativeai as genai
 import os
-import json
 import time
+import sys
+from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from common.history import ChatHistory
+from common.json_stream import read_step
+from common.providers import get_generative_model, use_fake_llm
 
 
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
-if not api_key:
+if not api_key and not use_fake_llm():
     raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
 
 # Configure the genai client
@@ -242,9 +248,10 @@ Keep servers running
 
 # ---------- MAIN LOOP ----------
 
-chat_history = []
+# Mirrors the chat session so the context size (in tokens) is known before every send.
+chat_history = ChatHistory()
 
-model = genai.GenerativeModel(
+model = get_generative_model(
             model_name="gemini-1.5-flash",  
             system_instruction=SYSTEM_PROMPT,
             generation_config={
@@ -253,7 +260,11 @@ model = genai.GenerativeModel(
         )
 
 # Start chat session with the user query
-chat = model.start_chat(history=chat_history)
+chat = model.start_chat(history=chat_history.messages)
+
+# Fields reported as soon as they close; "content" lets a reply whose JSON breaks later still be used
+STEP_FIELDS = ("step", "tool", "input", "content")
+RESEND_STEP = "Your last reply was not valid JSON. Send that step again as a single JSON object."
 
 def main():  
     print("\n🚀 Terminal Assistant Ready!")
@@ -269,28 +280,41 @@ def main():
            
 
             while True:
+                print(f"   🧮 Context : {chat_history.total_tokens} tokens")
                 for attempt in range(2):
+                    reply = None
                     try:
-                         # Send message to Gemini
-                        response = chat.send_message(user_input)  
-                        reply = response.text
-                        parsed = json.loads(reply)
+                         # Send message to Gemini; the reply is parsed as it streams
+                        reply = read_step(chat.send_message(user_input, stream=True), fields=STEP_FIELDS)
+                        chat_history.append("user", user_input)
+                        chat_history.append("model", reply.text)
+                        parsed = reply.step
+                        needed = ("tool", "input") if reply.fields.get("step") == "action" else ("content",)
+                        if parsed is None and "step" in reply.fields and all(key in reply.fields for key in needed):
+                            # The object broke after its step fields closed: use those instead of asking again
+                            parsed = reply.fields
+                        if parsed is None:
+                            raise ValueError(reply.error)
                         break
                     except Exception as e:
                         if attempt == 1:
-                            print(f"❌ Failed to get valid JSON after retry: {e}")
+                            print(f"❌ Failed to get a valid step after retry: {e}")
                             return
                         time.sleep(1)
+                        if reply is not None:
+                            # The broken reply is already in the chat history: ask for the step again, not the whole message
+                            user_input = RESEND_STEP
+                        # Otherwise the send itself failed and nothing was recorded: send the same message again
 
                 if parsed.get("step") != "action":
-                    print(f"\n🤖 Assistant :  {parsed['content']}")
+                    print(f"\n🤖 Assistant :  {parsed.get('content')}")
                                     
                 user_input = "Continue to the next step."
 
                 step = parsed.get("step")
 
                 if step == "plan":
-                    print(f"🔠 PLAN: {parsed['content']}")
+                    print(f"🔠 PLAN: {parsed.get('content')}")
                     continue
 
                 elif step == "action":
@@ -301,16 +325,17 @@ def main():
                         print(f"❌ Unknown tool: {tool_name}")
                         break
 
+                    # Every tool here touches the disk or a shell: run it only once the step is known to be valid
                     result = available_tools[tool_name](tool_input)
                     user_input = "Continue to the next step."
                     continue
 
                 elif step == "observe":
-                    print(f"👁️  OBSERVE :  {parsed['content']}")
+                    print(f"👁️  OBSERVE :  {parsed.get('content')}")
                     continue
 
                 elif step == "complete":
-                    print(f"✅  COMPLETE :  {parsed['content']}")
+                    print(f"✅  COMPLETE :  {parsed.get('content')}")
                     print("=" * 60)
 
                     while True:
@@ -1,11 +1,17 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
-import json
 import subprocess 
 from pathlib import Path
 from datetime import datetime
 import logging
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from common.json_stream import read_step
+from common.providers import get_generative_model, use_fake_llm
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,7 +22,7 @@ load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
 # Validate API Key
-if not api_key:
+if not api_key and not use_fake_llm():
     raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
 
 # Configure the genai client
@@ -157,7 +163,7 @@ def write_file_safely(path, content):
 def initialize_model():
     """Initialize the Gemini model with proper error handling."""
     try:
-        model = genai.GenerativeModel(
+        model = get_generative_model(
             model_name="gemini-1.5-flash",  
             system_instruction=SYSTEM_PROMPT,
             generation_config={
@@ -169,14 +175,13 @@ def initialize_model():
         logger.error(f"Error initializing model: {e}")
         raise
 
-def parse_json_response(response_text):
-    """Parse JSON response with proper error handling."""
-    try:
-        return json.loads(response_text)
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON Parse Error: {e}")
-        logger.error(f"Raw response: {response_text}")
-        return None
+def parse_json_response(response):
+    """Parse a streamed JSON response as it arrives, with proper error handling."""
+    reply = read_step(response)
+    if reply.step is None:
+        logger.error(f"JSON Parse Error: {reply.error}")
+        logger.error(f"Raw response: {reply.text}")
+    return reply.step
 
 def handle_output_step(parsed_response):
     """Handle the output step with file writing."""
@@ -239,10 +244,10 @@ def main():
                 while True:
                     try:
                         # Send message to Gemini
-                        response = chat.send_message(query)        
+                        response = chat.send_message(query, stream=True)
                         
                         # Parse the JSON response
-                        parsed_response = parse_json_response(response.text)
+                        parsed_response = parse_json_response(response)
                         if parsed_response is None:
                             break
                         
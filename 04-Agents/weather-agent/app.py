@@ -1,16 +1,22 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
-import json
+import sys
+from pathlib import Path
 import requests
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from common.json_stream import EarlyToolCall, read_step
+from common.providers import get_generative_model, use_fake_llm
+
 # Load environment variables from .env
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
 # Validate API Key
-if not api_key:
+if not api_key and not use_fake_llm():
     raise ValueError("❌ GEMINI_API_KEY not found in .env file.")
 
 # Configure the genai client
@@ -67,7 +73,7 @@ SYSTEM_PROMPT = f"""
 """
 
 # Initialize the model
-model = genai.GenerativeModel(
+model = get_generative_model(
     model_name="gemini-1.5-flash",  
     system_instruction=SYSTEM_PROMPT,
     generation_config={
@@ -93,15 +99,16 @@ try:
         
 
         while True:
-            # Send message to Gemini
-            response = chat.send_message(query)        
+            # Send message to Gemini; the reply is parsed as it streams, and an action's
+            # tool starts as soon as "function" and "input" have arrived
+            early_tool = EarlyToolCall(available_tools, name_field="function", early={"get_weather"})
+            reply = read_step(chat.send_message(query, stream=True), on_field=early_tool)
             
             # Parse the JSON response
-            try:
-                parsed_response = json.loads(response.text)
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON Parse Error: {e}")
-                print(f"Raw response: {response.text}")
+            parsed_response = reply.step
+            if parsed_response is None:
+                print(f"❌ JSON Parse Error: {reply.error}")
+                print(f"Raw response: {reply.text}")
                 break
             
             # Handle different steps
@@ -122,7 +129,7 @@ try:
                 # Fixed tool validation and execution
                 if tool_name in available_tools:
                     try:
-                        tool_output = available_tools[tool_name](tool_input)
+                        tool_output = early_tool.result(tool_name, tool_input)
                         print(f"  📊 : Tool output: {tool_output}")
                         # Send the tool output back to the model
                         query = f"Tool output: {tool_output}. Continue to the next step."
@@ -0,0 +1,164 @@
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Unix only; on Windows the peak comes from psutil, if installed
+    resource = None
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.embeddings import CachedEmbeddings, EmbeddingClient, langchain_embed_fn
+from common.local_store import LocalVectorStore
+from common.providers import HashingEmbeddings
+from chunking import Chunker
+from dedup import NearDuplicateFilter
+from indexer import IncrementalIndexer
+from ingest import IngestConfig, ingest
+from pdf_loader import ParallelPDFLoader
+
+# Measure the load -> split -> filter -> embed -> upsert pipeline end to end, offline.
+#
+#   python 05-RAG-01/bench_ingest.py                                 # 4 PDFs x 50 pages
+#   python 05-RAG-01/bench_ingest.py --pdfs 20 --pages 200 --embed-latency-ms 50
+#
+# Synthetic PDFs are written to a temp dir, vectors come from the hashing
+# embedder (no network, no cache) and go to a throwaway local vector store, so
+# the numbers only reflect our own indexing path. Output is JSON.
+
+WORDS = ("node js stream buffer event loop module package async await promise callback server request "
+         "response router middleware error handler file system path process thread worker cluster socket "
+         "http json parse config environment variable cache database query index vector").split()
+
+
+def _pdf_text(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, lines, rng):
+    """Minimal text-only PDF, one page object at a time so generation stays small in memory."""
+    offsets = []
+    with open(path, "w", encoding="latin-1") as f:
+        def obj(body):
+            offsets.append(f.tell())
+            f.write(f"{len(offsets)} 0 obj\n{body}\nendobj\n")
+
+        f.write("%PDF-1.4\n")
+        kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+        obj("<< /Type /Catalog /Pages 2 0 R >>")
+        obj(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>")
+        obj("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for page in range(pages):
+            # A running header/footer like real manuals have, around random body text
+            body = [f"Node.js Handbook - Chapter {page // 10 + 1}"]
+            body += [" ".join(rng.choices(WORDS, k=12)) for _ in range(lines)]
+            body += [f"Page {page + 1}"]
+            text = "".join(f"({_pdf_text(line)}) Tj T* " for line in body)
+            stream = f"BT /F1 10 Tf 12 TL 40 780 Td {text} ET"
+            obj(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * page} 0 R >>")
+            obj(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n")
+        f.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets))
+        f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its (PDF worker) children, in MB.
+
+    Either value is None where the platform can't report it (children's peak on Windows,
+    or everything without ``resource`` and ``psutil``).
+    """
+    if resource is not None:
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return round(own / divisor, 1), round(children / divisor, 1)
+    try:
+        import psutil
+    except ImportError:
+        return None, None
+    memory = psutil.Process().memory_info()
+    # peak_wset is Windows' peak working set; elsewhere fall back to the current RSS
+    return round(getattr(memory, "peak_wset", memory.rss) / (1024 * 1024), 1), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF ingestion pipeline with a fake embedder.")
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=50, help="Pages per PDF")
+    parser.add_argument("--lines", type=int, default=40, help="Text lines per page")
+    parser.add_argument("--pdf-workers", type=int, default=0, help="0 = one per CPU")
+    parser.add_argument("--chunk-mode", choices=["characters", "tokens"], default="characters")
+    parser.add_argument("--near-dup-threshold", type=float, default=0.9, help="0 disables the filter")
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Simulated latency per embed call")
+    parser.add_argument("--embed-texts-per-sec", type=float, default=0.0, help="Simulated provider throughput")
+    parser.add_argument("--embed-batch-size", type=int)
+    parser.add_argument("--embed-workers", type=int)
+    parser.add_argument("--upsert-batch-size", type=int)
+    parser.add_argument("--upsert-workers", type=int)
+    parser.add_argument("--queue-size", type=int)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # INGEST_* defaults, overridden by whatever was passed on the command line
+    config = IngestConfig.from_env()
+    for name in ("embed_batch_size", "embed_workers", "upsert_batch_size", "upsert_workers", "queue_size"):
+        if getattr(args, name) is not None:
+            setattr(config, name, getattr(args, name))
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-ingest-"))
+    try:
+        rng = random.Random(args.seed)
+        for i in range(args.pdfs):
+            write_pdf(workdir / f"doc-{i:03d}.pdf", args.pages, args.lines, rng)
+        rss_before, _ = peak_rss_mb()
+
+        fake = HashingEmbeddings(dim=args.embed_dim, latency_ms=args.embed_latency_ms,
+                                 texts_per_sec=args.embed_texts_per_sec)
+        client = EmbeddingClient(langchain_embed_fn(fake), model="bench", batch_size=config.embed_batch_size)
+        embedding = CachedEmbeddings(client)
+        vector_store = LocalVectorStore(workdir / "index", embedding)
+        indexer = IncrementalIndexer(vector_store, manifest_path=workdir / "manifest.json", embedding_model="bench",
+                                     checkpoint_path=workdir / "checkpoint.jsonl")
+        chunker = Chunker(mode=args.chunk_mode)
+        dedup = NearDuplicateFilter(args.near_dup_threshold) if args.near_dup_threshold > 0 else None
+
+        loader = ParallelPDFLoader(workdir, max_workers=args.pdf_workers or None)
+        start = time.perf_counter()
+        stats = ingest(loader.lazy_load(), chunker, embedding, vector_store, indexer, config, dedup=dedup)
+        elapsed = time.perf_counter() - start
+        client.close()
+
+        rss_peak, rss_children = peak_rss_mb()
+        pages = stats["pipeline"]["stages"]["load"]["items_out"]
+        report = {
+            "corpus": {"pdfs": args.pdfs, "pages": pages, "chunks": stats["chunking"]["chunks"]},
+            "config": {**vars(config), "pdf_workers": loader.max_workers, "chunk_mode": args.chunk_mode,
+                       "near_dup_threshold": args.near_dup_threshold, "embed_latency_ms": args.embed_latency_ms},
+            "seconds": round(elapsed, 3),
+            "pages_per_second": round(pages / elapsed, 1),
+            "chunks_per_second": round(stats["chunking"]["chunks"] / elapsed, 1),
+            "vectors_written": stats["index"]["embedded"],
+            "embed_batches": client.stats.provider_calls,
+            "peak_rss_mb": {"before_ingest": rss_before, "process": rss_peak, "pdf_workers": rss_children},
+            "dedup": stats.get("dedup"),
+            "stages": stats["pipeline"]["stages"],
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
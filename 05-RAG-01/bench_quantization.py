@@ -0,0 +1,98 @@
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.vector_index import MmapVectorIndex, normalize
+
+# Compare full-precision, int8 and binary storage of the same vectors.
+#
+#   python 05-RAG-01/bench_quantization.py                      # synthetic 768-dim vectors
+#   python 05-RAG-01/bench_quantization.py --index 05-RAG-01/.index/learning_vectors
+#
+# recall@k is measured against exact float32 search over the same vectors.
+
+
+def synthetic_vectors(n, dim, clusters, seed):
+    """Clustered vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    assignment = rng.integers(0, clusters, size=n)
+    return normalize(centers[assignment] + 0.6 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def load_index_vectors(path):
+    index = MmapVectorIndex(path)
+    rows = np.flatnonzero(index.alive)
+    return np.asarray(index._matrix[rows], dtype=np.float32)
+
+
+def run(vectors, queries, k, modes, oversampling):
+    ids = [str(i) for i in range(len(vectors))]
+    exact = normalize(queries) @ vectors.T
+    truth = [set(np.argsort(-row)[:k].astype(str)) for row in exact]
+    dim = vectors.shape[1]
+
+    report = []
+    for mode in modes:
+        workdir = Path(tempfile.mkdtemp(prefix=f"bench-{mode}-"))
+        try:
+            index = MmapVectorIndex(workdir, dim=dim, quantization=None if mode == "float32" else mode,
+                                    oversampling=oversampling)
+            index.add(ids, vectors)
+
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                results = index.search(query, k)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & {id_ for id_, _, _ in results})
+
+            code_bytes = {"float32": dim * 4, "int8": dim, "binary": (dim + 7) // 8}[mode]
+            report.append({
+                "mode": mode,
+                "bytes_per_vector": code_bytes,
+                "compression": round(dim * 4 / code_bytes, 1),
+                f"recall@{k}": round(hits / (k * len(queries)), 4),
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)) * 1000, 3),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            })
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized storage with exact rescoring.")
+    parser.add_argument("--index", help="Local index directory to take real vectors from")
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, default=4.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.index:
+        vectors = load_index_vectors(args.index)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, clusters=64, seed=args.seed)
+
+    rng = np.random.default_rng(args.seed + 1)
+    picked = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picked] + 0.05 * rng.normal(size=(len(picked), vectors.shape[1])).astype(np.float32)
+
+    report = run(vectors, queries, args.k, ["float32", "int8", "binary"], args.oversampling)
+    print(json.dumps({"vectors": len(vectors), "dim": vectors.shape[1], "oversampling": args.oversampling,
+                      "results": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
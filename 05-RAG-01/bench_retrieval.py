@@ -0,0 +1,246 @@
+import sys
+import json
+import time
+import random
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.local_store import LocalVectorStore, use_local_store
+from common.providers import get_embeddings
+from common.quantization import qdrant_search_params
+from common.query_cache import QueryEmbeddingCache
+from hybrid import HybridRetriever, document_id
+from mmr import mmr_rerank
+from sparse_index import SparseIndex
+from store import open_vector_store, sparse_index_path
+
+# Retrieval quality and latency of the chat's retriever against exact search.
+#
+#   python 05-RAG-01/bench_retrieval.py                          # settings from .env, like chat.py
+#   RETRIEVAL_MODE=dense QUANTIZATION=binary RESCORE_OVERSAMPLING=2 python 05-RAG-01/bench_retrieval.py
+#   python 05-RAG-01/bench_retrieval.py --queries 500 --k 10 --concurrency 1,8,32
+#
+# Queries are sampled from the indexed chunks themselves: a run of words cut
+# out of a random chunk, labeled with every chunk that contains it (neighbours
+# share up to 400 characters). Each query goes through both
+#   exact     : brute-force cosine over all full-precision vectors
+#   configured: what chat.py runs (dense or hybrid, quantized or not, MMR)
+# and the report gives recall@k of the retriever against the exact top-k,
+# MRR / hit rate of both against the labels, and latency percentiles at
+# several concurrency levels. Query vectors are computed before timing starts,
+# so latencies are search only. Output is JSON.
+
+load_dotenv()
+
+
+def load_chunks(vector_store) -> list[tuple[str, str]]:
+    """``(id, text)`` of every indexed chunk."""
+    if isinstance(vector_store, LocalVectorStore):
+        index = vector_store.index
+        if index is None:
+            return []
+        return [(index.ids[row], index.payloads[row]["page_content"]) for row in np.flatnonzero(index.alive)]
+
+    chunks, offset = [], None
+    while True:
+        points, offset = vector_store.client.scroll(vector_store.collection_name, limit=512, offset=offset,
+                                                    with_payload=True, with_vectors=False)
+        chunks += [(str(point.id), point.payload[vector_store.content_payload_key]) for point in points]
+        if offset is None:
+            return chunks
+
+
+def make_queries(chunks, count: int, words: int, seed: int) -> list[dict]:
+    """Word windows cut from random chunks, each labeled with the chunks containing it."""
+    rng = random.Random(seed)
+    flat = [(id_, " ".join(text.split())) for id_, text in chunks]
+    queries, seen = [], set()
+    for id_, text in rng.sample(flat, len(flat)):
+        tokens = text.split()
+        if len(tokens) < words:
+            continue
+        start = rng.randrange(len(tokens) - words + 1)
+        query = " ".join(tokens[start:start + words])
+        if query in seen:
+            continue
+        seen.add(query)
+        queries.append({"query": query, "source": id_,
+                        "relevant": {other for other, other_text in flat if query in other_text}})
+        if len(queries) == count:
+            break
+    return queries
+
+
+def exact_searcher(vector_store, k: int):
+    """Brute-force top-k over the original vectors: the ground truth for recall."""
+    if isinstance(vector_store, LocalVectorStore):
+        index = vector_store.index
+
+        def search(query, vector):
+            # scores() reads the full-precision matrix, never the quantized codes
+            scores = np.where(index.alive, index.scores(vector), -np.inf)
+            top = np.argpartition(-scores, k - 1)[:k]
+            return [index.ids[row] for row in top[np.argsort(-scores[top])]]
+        return search
+
+    from qdrant_client import models
+
+    def search(query, vector):
+        points = vector_store.client.query_points(
+            vector_store.collection_name, query=vector, using=vector_store.vector_name or None, limit=k,
+            search_params=models.SearchParams(exact=True), with_payload=False,
+        ).points
+        return [str(point.id) for point in points]
+    return search
+
+
+def configured_searcher(vector_store, retriever, k: int, fetch_k: int, lambda_mult: float, search_params):
+    """The retrieval step of chat.py: dense or hybrid candidates, then MMR."""
+    def search(query, vector):
+        scores = None
+        if retriever is not None:
+            hits = retriever.search_with_scores(query, k=max(fetch_k, k), query_vector=vector)
+            candidates = [doc for doc, _ in hits]
+            scores = [score for _, score in hits]
+        else:
+            candidates = vector_store.similarity_search_by_vector(vector, k=max(fetch_k, k),
+                                                                  search_params=search_params)
+        if fetch_k > k:
+            candidates = mmr_rerank(vector_store, vector, candidates, k=k, lambda_mult=lambda_mult, scores=scores)
+        return [document_id(doc) for doc in candidates[:k]]
+    return search
+
+
+def percentile_ms(latencies, q) -> float:
+    return round(float(np.percentile(latencies, q)) * 1000, 3)
+
+
+def run_level(search, queries, vectors, concurrency: int) -> tuple[list, dict]:
+    def timed(i):
+        start = time.perf_counter()
+        ids = search(queries[i]["query"], vectors[i])
+        return ids, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(len(queries))))
+    wall = time.perf_counter() - start
+    latencies = [latency for _, latency in results]
+    return [ids for ids, _ in results], {
+        "concurrency": concurrency,
+        "qps": round(len(queries) / wall, 1),
+        "latency_ms_p50": percentile_ms(latencies, 50),
+        "latency_ms_p95": percentile_ms(latencies, 95),
+        "latency_ms_p99": percentile_ms(latencies, 99),
+    }
+
+
+def rank_quality(results, queries, k: int) -> dict:
+    reciprocal, hits = 0.0, 0
+    for ids, query in zip(results, queries):
+        rank = next((position for position, id_ in enumerate(ids[:k], start=1) if id_ in query["relevant"]), None)
+        if rank is not None:
+            reciprocal += 1 / rank
+            hits += 1
+    return {f"mrr@{k}": round(reciprocal / len(queries), 4), f"hit@{k}": round(hits / len(queries), 4)}
+
+
+def recall_against(results, truth, k: int) -> float:
+    found = sum(len(set(ids[:k]) & set(expected[:k])) for ids, expected in zip(results, truth))
+    possible = sum(min(k, len(expected)) for expected in truth)
+    return round(found / possible, 4) if possible else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chat retriever against exact search.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=12, help="Words cut out of a chunk per query")
+    parser.add_argument("--k", type=int, default=4, help="Results per query (chat.py uses 4)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated thread counts")
+    parser.add_argument("--mode", default=os.getenv("RETRIEVAL_MODE", "hybrid").lower(), choices=["hybrid", "dense"])
+    parser.add_argument("--dense-k", type=int, default=3)
+    parser.add_argument("--sparse-k", type=int, default=10)
+    parser.add_argument("--mmr-fetch-k", type=int, default=int(os.getenv("MMR_FETCH_K", "12")))
+    parser.add_argument("--mmr-lambda", type=float, default=float(os.getenv("MMR_LAMBDA", "0.5")))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    quantization = os.getenv("QUANTIZATION")
+    oversampling = float(os.getenv("RESCORE_OVERSAMPLING", "4.0"))
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    # The query cache doubles as the query-vector table: every query is embedded
+    # once up front, so the hybrid retriever's own embed_query is a cache hit
+    embedding = QueryEmbeddingCache(get_embeddings(model="models/embedding-001"), maxsize=args.queries * 2)
+    vector_store = open_vector_store(embedding, quantization, oversampling)
+    chunks = load_chunks(vector_store)
+    if len(chunks) < args.k:
+        sys.exit("Index is empty or smaller than k: run main.py first.")
+
+    queries = make_queries(chunks, args.queries, args.query_words, args.seed)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        vectors = [np.asarray(vector, dtype=np.float32)
+                   for vector in pool.map(embedding.embed_query, [query["query"] for query in queries])]
+    embed_seconds = time.perf_counter() - start
+
+    search_params = qdrant_search_params(quantization, oversampling)
+    retriever = None
+    if args.mode == "hybrid":
+        if not sparse_index_path().exists():
+            sys.exit("RETRIEVAL_MODE=hybrid needs the BM25 index: run main.py first (or pass --mode dense).")
+        retriever = HybridRetriever(vector_store, SparseIndex(sparse_index_path()), dense_k=args.dense_k,
+                                    sparse_k=args.sparse_k, search_kwargs={"search_params": search_params})
+
+    searchers = {
+        "exact": exact_searcher(vector_store, args.k),
+        "configured": configured_searcher(vector_store, retriever, args.k, args.mmr_fetch_k, args.mmr_lambda,
+                                         search_params),
+    }
+
+    report = {}
+    for name, search in searchers.items():
+        # Warm-up pass: page the memory-mapped matrix in and open connections before timing
+        run_level(search, queries[:20], vectors[:20], 1)
+        latency, results = [], None
+        for level in levels:
+            level_results, stats = run_level(search, queries, vectors, level)
+            results = results or level_results
+            latency.append(stats)
+        report[name] = {"results": results, "quality": rank_quality(results, queries, args.k), "latency": latency}
+
+    truth = report["exact"]["results"]
+    report["configured"]["quality"][f"recall@{args.k}_vs_exact"] = recall_against(
+        report["configured"]["results"], truth, args.k)
+
+    if retriever is not None:
+        retriever.close()
+    print(json.dumps({
+        "backend": "local" if use_local_store() else "qdrant",
+        "chunks": len(chunks),
+        "queries": len(queries),
+        "k": args.k,
+        "query_embedding_seconds": round(embed_seconds, 3),
+        "retriever": {
+            "mode": args.mode,
+            "quantization": quantization or "none",
+            "oversampling": oversampling,
+            "dense_k": args.dense_k if retriever is not None else None,
+            "sparse_k": args.sparse_k if retriever is not None else None,
+            "mmr_fetch_k": args.mmr_fetch_k if args.mmr_fetch_k > args.k else 0,
+            "mmr_lambda": args.mmr_lambda,
+        },
+        "exact": {key: value for key, value in report["exact"].items() if key != "results"},
+        "configured": {key: value for key, value in report["configured"].items() if key != "results"},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,223 @@
 from langchain_qdrant import QdrantVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 import google.generativeai as genai
 from dotenv import load_dotenv
+from pathlib import Path
 import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.local_store import LocalVectorStore, use_local_store
+from common.quantization import qdrant_search_params
+from common.providers import embedding_cache_key, get_embeddings, get_generative_model
+from common.query_cache import QueryEmbeddingCache
+from common.semantic_cache import SemanticAnswerCache
+from common.streaming import send_streaming
+from context_packer import ContextPacker
+from filters import SearchFilter, parse_filters, store_filter
+from hybrid import HybridRetriever, document_id
+from mmr import mmr_rerank
+from sparse_index import SparseIndex
+from store import ensure_payload_indexes, indexed_sources, sparse_index_path
 
 load_dotenv()
 genai.configure(api_key = os.getenv("GOOGLE_API_KEY"))
 
-# -------------- Vector Embedding -------------
+# Must match the QUANTIZATION used by main.py; candidates are rescored with the original vectors
+QUANTIZATION = os.getenv("QUANTIZATION")
+OVERSAMPLING = float(os.getenv("RESCORE_OVERSAMPLING", "4.0"))
 
-embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001"
-)
+# Query vectors are kept in memory (LRU, expiring after QUERY_CACHE_TTL seconds)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
 
-#------------- Vector Db connection -----------
-vector_db  = QdrantVectorStore.from_existing_collection(
-     url = "http://localhost:6333",
-    collection_name = "learning_vectors",
-    embedding=embedding_model
-)
+# RETRIEVAL_MODE = hybrid (BM25 + vector, fused with RRF) | dense (vector only)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
 
+# Answers are reused for questions within this cosine similarity (0 disables the answer cache)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
 
+# Over-fetch MMR_FETCH_K candidates and keep the TOP_K most relevant *distinct* ones
+# (MMR_LAMBDA = 1 : pure relevance, 0 : pure diversity, MMR_FETCH_K = 0 : no re-ranking)
+TOP_K = 4
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "12"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
 
-# Take a user Query
-query = input("👨 > ")
+# Hard cap on the retrieved context sent per question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
 
+# -------------- Vector Embedding -------------
 
-# Vector Similarity Search [query] in DB
-search_results = vector_db.similarity_search(
-    query=query
+# Every turn embeds its question; repeated ones ("What is the event loop?" /
+# "what is the event loop") come back from the cache without an embedding round-trip
+embedding_model = QueryEmbeddingCache(
+    get_embeddings(model="models/embedding-001"),
+    maxsize=QUERY_CACHE_SIZE,
+    ttl=QUERY_CACHE_TTL
 )
 
-# print("\nSearch Result : \n",search_results)
-
-context = "\n\n\n".join([f"Page Content: {result.page_content}\nPage Number: {result.metadata['page_label']}\nFile Location: {result.metadata['source']}" for result in search_results])
-
-SYSTEM_PROMPT = f"""
+#------------- Vector Db connection -----------
+if use_local_store():
+    # VECTOR_STORE=local : memory-mapped index written by main.py, vectors are not read at open
+    vector_db = LocalVectorStore.from_existing_collection(
+        path = Path(__file__).parent/".index"/"learning_vectors",
+        embedding=embedding_model,
+        oversampling=OVERSAMPLING
+    )
+else:
+    vector_db  = QdrantVectorStore.from_existing_collection(
+         url = "http://localhost:6333",
+        collection_name = "learning_vectors",
+        embedding=embedding_model
+    )
+
+# Filtered questions (source:/pages:) are answered from payload indexes, not by scanning every point
+ensure_payload_indexes(vector_db)
+known_sources = indexed_sources()
+
+
+#------------- BM25 index (written by main.py) -----------
+retriever = None
+if RETRIEVAL_MODE == "hybrid" and sparse_index_path().exists():
+    # BM25 catches exact API names (fs.readFile, process.nextTick), so the dense side needs fewer hits
+    retriever = HybridRetriever(
+        vector_db,
+        SparseIndex(sparse_index_path()),
+        dense_k=3,
+        sparse_k=10,
+        search_kwargs={"search_params": qdrant_search_params(QUANTIZATION, OVERSAMPLING)}
+    )
+
+
+def retrieve(query, query_vector, search_filter=SearchFilter()):
+    fetch_k = max(MMR_FETCH_K, TOP_K)
+    # The filter is part of the search itself, so a filtered question still gets fetch_k matching chunks
+    conditions = search_filter.conditions()
+
+    if retriever is not None:
+        # BM25 and vector search run concurrently, results fused with reciprocal rank fusion
+        hits = retriever.search_with_scores(query, k=fetch_k, filter=conditions, query_vector=query_vector)
+        candidates = [doc for doc, _ in hits]
+        scores = [score for _, score in hits]
+    else:
+        # Vector Similarity Search [query] in DB, with the vector already computed for the answer cache
+        scores = None
+        candidates = vector_db.similarity_search_by_vector(
+            query_vector,
+            k=fetch_k,
+            filter=store_filter(vector_db, conditions) if conditions else None,
+            search_params=qdrant_search_params(QUANTIZATION, OVERSAMPLING)
+        )
+
+    if MMR_FETCH_K <= TOP_K:
+        return candidates[:TOP_K]
+    # Overlapping neighbour chunks are near copies: keep only distinct ones for the prompt
+    return mmr_rerank(vector_db, query_vector, candidates, k=TOP_K, lambda_mult=MMR_LAMBDA, scores=scores)
+
+
+#------------- Semantic answer cache -----------
+answer_cache = None
+if SEMANTIC_CACHE_THRESHOLD > 0:
+    answer_cache = SemanticAnswerCache(
+        Path(__file__).parent/".cache"/"answers.sqlite",
+        model=embedding_cache_key("models/embedding-001"),
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_SIZE
+    )
+
+
+def chunks_unchanged(chunk_ids):
+    # Chunk ids are content fingerprints: re-indexing an edited page removes the old ids
+    return len(vector_db.get_by_ids(chunk_ids)) == len(chunk_ids)
+
+
+# Hits of the same page are stitched back together (overlap kept once) and packed best-first
+context_packer = ContextPacker(budget_tokens=CONTEXT_TOKEN_BUDGET)
+
+
+def build_context(search_results):
+    return context_packer.pack(search_results)
+
+
+SYSTEM_PROMPT = """
      You are a helpfull AI Assistant who asnweres user query based on the available context
     retrieved from a PDF file along with page_contents and page number.
 
-    You should only ans the user based on the following context and navigate the user
+    The latest user message brings the context retrieved for it; earlier
+    questions are kept without their context.
+    You should only ans the user based on that context and navigate the user
     to open the right page number to know more.
 
-    Context:
-    {context}
-
 """
 
-model = genai.GenerativeModel(
+model = get_generative_model(
     model_name="gemini-1.5-flash",  
     system_instruction=SYSTEM_PROMPT  
 )
 
-chat_history = []
+# One chat session for the whole conversation: the history grows turn by turn
+chat = model.start_chat(history=[])
+
+# A line of filters only ("source:nodejs pages:100-200") limits every following question,
+# "/all" lifts it; the same tokens inside a question apply to that question alone
+active_filter = SearchFilter()
 
 while True:
+    # Take a user Query
+    query = input("👨 > ")
+
+    if query.strip().lower() == "/all":
+        active_filter = SearchFilter()
+        print("🔎 searching everything")
+        continue
+
+    try:
+        question, turn_filter = parse_filters(query, known_sources)
+    except ValueError as error:
+        print(f"⚠️  {error}")
+        continue
+    if turn_filter and not question:
+        active_filter = turn_filter
+        print(f"🔎 searching {active_filter.describe()}")
+        continue
+    search_filter = turn_filter or active_filter
+    query = question
+
     if query.lower() in ["exit", "quit","q"]:
         print("\n Buy ✌️  ✌️  ✌️ ...\n")
+        print("🧠 query cache : ", embedding_model.stats.as_dict())
+        if answer_cache is not None:
+            print("💾 answer cache : ", answer_cache.stats.as_dict())
         break
 
-    chat = model.start_chat(history=chat_history)
-    response = chat.send_message(query)
-    print(f"🤖 : {response.text}")
-    query = input("👨 > ")
\ No newline at end of file
+    query_vector = embedding_model.embed_query(query)
+
+    # Same question asked before (and its pages unchanged): answer without retrieval or generation.
+    # Cached answers were grounded on the whole collection, so filtered questions skip the cache.
+    # Only a session's opening question is standalone: a follow-up ("tell me more") means
+    # something else in every conversation, so later turns neither read nor fill the cache
+    use_answer_cache = answer_cache is not None and not search_filter and not chat.history
+    cached = answer_cache.lookup(query_vector, is_valid=chunks_unchanged) if use_answer_cache else None
+    if cached is not None:
+        print(f"🤖 : {cached.answer}")
+        chat.history = [*chat.history, {"role": "user", "parts": [query]}, {"role": "model", "parts": [cached.answer]}]
+        continue
+
+    # Retrieve for this question, not just the first one
+    search_results = retrieve(query, query_vector, search_filter)
+    context = build_context(search_results)
+    if search_filter:
+        print(f"🔎 {search_filter.describe()} : {len(search_results)} chunks")
+    print(f"📦 context : {context_packer.last_stats.tokens}/{CONTEXT_TOKEN_BUDGET} tokens")
+
+    # Tokens are printed as they arrive (STREAM_OUTPUT=0 waits for the whole reply)
+    answer, timing = send_streaming(chat, f"Context:\n{context}\n\nQuestion: {query}")
+    print(f"   {timing.summary()}")
+
+    # The context is for this turn only: keep the bare question in the history, so later
+    # turns don't re-send every earlier context and CONTEXT_TOKEN_BUDGET stays the real cap
+    chat.history = [*chat.history[:-2], {"role": "user", "parts": [query]}, chat.history[-1]]
+
+    if use_answer_cache:
+        answer_cache.store(query, query_vector, [document_id(result) for result in search_results], answer)
@@ -0,0 +1,140 @@
+"""
+Token-budgeted prompt context.
+
+Search hits are grouped by (source, page). Hits of the same page usually
+overlap (the splitter repeats up to 400 characters between neighbours), so
+they are stitched back into contiguous spans with the repeated text kept
+once. Groups are then added in rank order of their best hit until the token
+budget is full; the group that doesn't fit is cut at a token boundary, so the
+context never exceeds the budget however long the pages are.
+"""
+from dataclasses import dataclass
+
+from common.tokens import DEFAULT_MODEL, count_tokens, get_encoding
+
+# Overlaps shorter than this are treated as coincidence, not as shared chunk text
+MIN_OVERLAP_CHARS = 20
+GAP_MARKER = "\n...\n"
+
+
+def overlap_length(left: str, right: str, min_overlap: int = MIN_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right`` (0 below ``min_overlap``)."""
+    if len(left) < min_overlap or len(right) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    start = len(left) - min(len(left), len(right))
+    position = left.find(probe, start)
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def stitch_spans(chunks: list) -> list[str]:
+    """Merge the chunks of one page into as few contiguous spans as possible."""
+    if all("start_index" in chunk.metadata for chunk in chunks):
+        # Offsets known (splitter ran with add_start_index): merge by position
+        spans = []
+        for chunk in sorted(chunks, key=lambda chunk: chunk.metadata["start_index"]):
+            start, text = chunk.metadata["start_index"], chunk.page_content
+            if spans and start <= spans[-1][1]:
+                span_start, span_end, span_text = spans[-1]
+                if start + len(text) > span_end:
+                    span_text += text[span_end - start:]
+                spans[-1] = (span_start, max(span_end, start + len(text)), span_text)
+            else:
+                spans.append((start, start + len(text), text))
+        return [text for _, _, text in spans]
+
+    # Older indexes have no offsets: find overlaps from the text itself
+    spans = [chunk.page_content for chunk in chunks]
+    merged = True
+    while merged and len(spans) > 1:
+        merged = False
+        for i, left in enumerate(spans):
+            for j, right in enumerate(spans):
+                if i == j:
+                    continue
+                if right in left:
+                    spans.pop(j)
+                    merged = True
+                    break
+                size = overlap_length(left, right)
+                if size:
+                    spans[i] = left + right[size:]
+                    spans.pop(j)
+                    merged = True
+                    break
+            if merged:
+                break
+    return spans
+
+
+@dataclass
+class PackStats:
+    hits: int = 0
+    groups: int = 0
+    groups_packed: int = 0
+    truncated: bool = False
+    tokens: int = 0
+    budget: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class ContextPacker:
+
+    def __init__(self, budget_tokens: int = 2000, model: str = DEFAULT_MODEL):
+        self.budget_tokens = budget_tokens
+        self.model = model
+        self.last_stats = PackStats(budget=budget_tokens)
+
+    @staticmethod
+    def format_group(text: str, metadata: dict) -> str:
+        return f"Page Content: {text}\nPage Number: {metadata.get('page_label')}\nFile Location: {metadata.get('source')}"
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        encoding = get_encoding(self.model)
+        return encoding.decode(encoding.encode_ordinary(text)[:tokens])
+
+    def pack(self, docs: list) -> str:
+        """``docs`` best first; returns the context string and records ``last_stats``."""
+        groups = {}
+        for doc in docs:
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            groups.setdefault(key, []).append(doc)   # dicts keep first-seen (= best rank) order
+
+        stats = PackStats(hits=len(docs), groups=len(groups), budget=self.budget_tokens)
+        separator_tokens = count_tokens("\n\n\n", self.model)
+        blocks, used = [], 0
+        for chunks in groups.values():
+            text = GAP_MARKER.join(stitch_spans(chunks))
+            block = self.format_group(text, chunks[0].metadata)
+            cost = count_tokens(block, self.model) + (separator_tokens if blocks else 0)
+            if used + cost <= self.budget_tokens:
+                blocks.append(block)
+                used += cost
+                stats.groups_packed += 1
+                continue
+
+            # Cut the page text so the block (header lines included) fills the rest of the budget exactly
+            overhead = cost - count_tokens(text, self.model)
+            room = self.budget_tokens - used - overhead
+            if room > 0:
+                block = self.format_group(self._truncate(text, room), chunks[0].metadata)
+                blocks.append(block)
+                used += count_tokens(block, self.model) + (separator_tokens if len(blocks) > 1 else 0)
+                stats.groups_packed += 1
+            stats.truncated = True
+            break
+
+        context = "\n\n\n".join(blocks)
+        # Token counts of the parts don't always add up exactly (merges across joins): enforce the budget
+        stats.tokens = count_tokens(context, self.model)
+        if stats.tokens > self.budget_tokens:
+            context = self._truncate(context, self.budget_tokens)
+            stats.tokens = count_tokens(context, self.model)
+        self.last_stats = stats
+        return context
@@ -0,0 +1,186 @@
+"""
+Near-duplicate chunk elimination with MinHash + LSH.
+
+Repeated page headers/footers, boilerplate and re-printed sections produce
+chunks that differ only in a page number or a word. Each chunk is reduced to
+a set of word shingles (digits folded so "Page 12" == "Page 13"), summarised by
+a MinHash signature and bucketed by LSH bands; a chunk whose estimated Jaccard
+similarity with an already kept chunk reaches ``threshold`` is dropped before
+it costs an embedding.
+
+Which chunk of a group survives must not depend on thread timing, or point
+ids would churn between runs of the incremental indexer. ``release`` takes
+whole pages tagged with their load-order sequence number, holds pages that
+arrive early, and decides in document order: the earliest (source, page,
+start_index) of a group is kept.
+
+Signatures (128 x uint32 per chunk) are spilled to a memory-mapped temporary
+file instead of living on the heap, and LSH buckets are keyed by a hash of
+each band, so the filter's RAM stays small on large corpora.
+
+Environment knobs (all optional)::
+
+    NEAR_DUP_THRESHOLD  estimated Jaccard similarity to drop at, 0 disables (0.9)
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_WORD = re.compile(r"\w+")
+_DIGITS = re.compile(r"\d+")
+
+
+def shingles(text: str, size: int = 5) -> set[str]:
+    words = _WORD.findall(_DIGITS.sub("0", text.lower()))
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+@dataclass
+class DedupStats:
+    checked: int = 0
+    dropped: int = 0
+
+    def as_dict(self) -> dict:
+        return {"checked": self.checked, "dropped": self.dropped, "vectors_saved": self.dropped}
+
+
+class SignatureStore:
+    """Fixed-width uint32 rows appended to a memory-mapped temporary file."""
+
+    def __init__(self, width: int):
+        self.width = width
+        self._file = tempfile.TemporaryFile()
+        self._map = None
+        self._capacity = 0
+        self._count = 0
+
+    def _grow(self, capacity: int):
+        # Drop the old mapping before resizing the file (required on Windows)
+        if self._map is not None:
+            self._map.flush()
+        self._map = None
+        self._file.truncate(capacity * self.width * 4)
+        self._map = np.memmap(self._file, dtype=np.uint32, mode="r+", shape=(capacity, self.width))
+        self._capacity = capacity
+
+    def append(self, row: np.ndarray) -> int:
+        if self._count == self._capacity:
+            self._grow(max(1024, self._capacity * 2))
+        self._map[self._count] = row
+        self._count += 1
+        return self._count - 1
+
+    def rows(self, indices) -> np.ndarray:
+        return self._map[np.fromiter(indices, dtype=np.int64)]
+
+    def __len__(self):
+        return self._count
+
+
+class MinHashLSH:
+    """MinHash signatures (``num_perm`` permutations) indexed in ``bands`` LSH bands."""
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = SignatureStore(num_perm)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles(text)),
+            dtype=np.uint64,
+        )
+        # (a * x + b) mod p for every permutation at once; x < 2^32 and the
+        # uint64 product may wrap, which only reshuffles the permutation
+        permuted = (hashes[None, :] * self._a[:, None] + self._b[:, None]) % np.uint64(MERSENNE_PRIME)
+        return (permuted & np.uint64(MAX_HASH)).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        # A hash instead of the band's bytes: collisions only add candidates, which are checked below
+        for band in range(self.bands):
+            yield band, hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def query(self, signature: np.ndarray) -> float:
+        """Highest estimated Jaccard similarity with an indexed signature (0.0 without candidates)."""
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        if not candidates:
+            return 0.0
+        matrix = self._signatures.rows(candidates)
+        return float((matrix == signature).mean(axis=1).max())
+
+    def insert(self, signature: np.ndarray):
+        index = self._signatures.append(signature)
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(index)
+
+
+class NearDuplicateFilter:
+    """Keeps the first chunk, in document order, of every near-duplicate group."""
+
+    def __init__(self, threshold: float = 0.9, **lsh_options):
+        self.lsh = MinHashLSH(threshold=threshold, **lsh_options)
+        self.stats = DedupStats()
+        self._lock = threading.Lock()
+        self._pending = {}          # sequence number -> (chunk, signature) pairs of a page that arrived early
+        self._next = 0
+
+    @classmethod
+    def from_env(cls) -> "NearDuplicateFilter | None":
+        threshold = float(os.getenv("NEAR_DUP_THRESHOLD") or 0.9)
+        return cls(threshold=threshold) if threshold > 0 else None
+
+    def is_duplicate(self, text: str) -> bool:
+        signature = self.lsh.signature(text)
+        with self._lock:
+            self.stats.checked += 1
+            if self.lsh.query(signature) >= self.lsh.threshold:
+                self.stats.dropped += 1
+                return True
+            self.lsh.insert(signature)
+        return False
+
+    def filter(self, chunks) -> list:
+        return [doc for doc in chunks if not self.is_duplicate(doc.page_content)]
+
+    def release(self, sequence: int, chunks: list) -> list:
+        """Kept chunks of page ``sequence`` and of any held pages it unblocks, in document order.
+
+        Every page must be passed exactly once (with ``[]`` if it has no chunks),
+        numbered from 0 in load order.
+        """
+        # Signatures are the costly part; only the ordered insert runs under the lock
+        signed = [(chunk, self.lsh.signature(chunk.page_content))
+                  for chunk in sorted(chunks, key=lambda chunk: chunk.metadata.get("start_index", 0))]
+        kept = []
+        with self._lock:
+            self._pending[sequence] = signed
+            while self._next in self._pending:
+                for chunk, signature in self._pending.pop(self._next):
+                    self.stats.checked += 1
+                    if self.lsh.query(signature) >= self.lsh.threshold:
+                        self.stats.dropped += 1
+                    else:
+                        self.lsh.insert(signature)
+                        kept.append(chunk)
+                self._next += 1
+        return kept
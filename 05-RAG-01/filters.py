@@ -0,0 +1,118 @@
+"""
+Metadata filters for chat retrieval.
+
+A question can be limited to some manuals and to a page range::
+
+    source:nodejs pages:100-200 how are streams piped?
+    source:express               (on its own: applies to every following question)
+    /all                         (search the whole collection again)
+
+``source:`` matches indexed PDFs by file name (case-insensitive, partial
+names are fine), ``pages:`` takes ``N``, ``N-M`` or ``N-`` as printed page
+numbers, or a page label such as ``iv``.
+
+Filters are pushed down into the searches instead of being applied to their
+results: a Qdrant ``Filter`` on indexed payload fields (a payload-index row
+mask in the local store) on the dense side and a SQL condition on the BM25
+side, so only matching chunks are scored and a filtered query still returns
+k hits.
+"""
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from common.local_store import LocalVectorStore
+
+_FILTER_TOKEN = re.compile(r"(?<!\S)(source|in|pages?):(\S+)", re.IGNORECASE)
+_PAGE_RANGE = re.compile(r"^(\d+)(?:\s*[-–—]\s*(\d*))?$")
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    sources: tuple = ()
+    pages: tuple | None = None      # (first, last) printed page numbers, last may be None
+    page_labels: tuple = ()
+
+    def __bool__(self):
+        return bool(self.sources or self.pages or self.page_labels)
+
+    def conditions(self) -> dict:
+        """Metadata conditions in the ``LocalVectorStore`` filter form."""
+        conditions = {}
+        if self.sources:
+            conditions["source"] = list(self.sources)
+        if self.pages:
+            # PyPDFLoader's "page" is 0-based
+            first, last = self.pages
+            conditions["page"] = {"gte": first - 1} if last is None else {"gte": first - 1, "lte": last - 1}
+        if self.page_labels:
+            conditions["page_label"] = list(self.page_labels)
+        return conditions
+
+    def describe(self) -> str:
+        parts = [", ".join(Path(source).name for source in self.sources)] if self.sources else []
+        if self.pages:
+            first, last = self.pages
+            parts.append(f"pages {first}-{last if last is not None else 'end'}")
+        if self.page_labels:
+            parts.append("pages " + ", ".join(self.page_labels))
+        return " · ".join(parts) if parts else "everything"
+
+
+def resolve_sources(name: str, known_sources) -> list[str]:
+    """Indexed sources whose path is ``name`` or whose file name contains it."""
+    if name in known_sources:
+        return [name]
+    needle = name.lower()
+    return [source for source in known_sources if needle in Path(source).name.lower()]
+
+
+def parse_filters(text: str, known_sources) -> tuple[str, SearchFilter]:
+    """Split ``source:``/``pages:`` tokens off a chat line; raises ValueError on an unknown manual or page spec."""
+    sources, pages, labels = [], None, []
+    for kind, value in _FILTER_TOKEN.findall(text):
+        if kind.lower() in ("source", "in"):
+            matched = resolve_sources(value, known_sources)
+            if not matched:
+                raise ValueError(f"No indexed manual matches {value!r}.")
+            sources.extend(source for source in matched if source not in sources)
+            continue
+        match = _PAGE_RANGE.match(value)
+        if match:
+            first = int(match.group(1))
+            if match.group(2) is None:
+                last = first
+            else:
+                last = int(match.group(2)) if match.group(2) else None
+            if last is not None and last < first:
+                raise ValueError(f"Empty page range {value!r}.")
+            pages = (first, last)
+        elif value.isalnum():
+            labels.append(value)
+        else:
+            raise ValueError(f"Can't read page spec {value!r}; use pages:12, pages:100-200 or pages:iv.")
+    question = " ".join(_FILTER_TOKEN.sub(" ", text).split())
+    return question, SearchFilter(sources=tuple(sources), pages=pages, page_labels=tuple(labels))
+
+
+def qdrant_filter(conditions: dict):
+    """Qdrant ``Filter`` for metadata conditions; matched through the collection's payload indexes."""
+    from qdrant_client import models
+
+    must = []
+    for key, condition in conditions.items():
+        field = f"metadata.{key}"
+        if isinstance(condition, dict):
+            must.append(models.FieldCondition(key=field, range=models.Range(**condition)))
+        elif isinstance(condition, (list, tuple)):
+            must.append(models.FieldCondition(key=field, match=models.MatchAny(any=list(condition))))
+        else:
+            must.append(models.FieldCondition(key=field, match=models.MatchValue(value=condition)))
+    return models.Filter(must=must)
+
+
+def store_filter(vector_store, conditions: dict):
+    """``filter`` argument for ``vector_store``'s search methods."""
+    if isinstance(vector_store, LocalVectorStore):
+        return conditions
+    return qdrant_filter(conditions)
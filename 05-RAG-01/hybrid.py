@@ -0,0 +1,80 @@
+"""
+Hybrid retrieval: BM25 and dense search in parallel, fused with RRF.
+
+Dense search finds paraphrases, BM25 finds exact identifiers (``fs.readFile``,
+``process.nextTick``) that embeddings blur together. Both run concurrently and
+their rankings are merged with reciprocal rank fusion, which needs no score
+calibration between the two: a chunk's fused score is the sum of
+``1 / (rrf_k + rank)`` over the rankings it appears in. Because BM25 brings
+its own candidates, the dense side can be asked for fewer results.
+
+A metadata ``filter`` restricts both sides before they score anything.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from filters import store_filter
+
+
+def document_id(doc) -> str:
+    """Point id of a search result (the local store sets ``doc.id``, Qdrant ``metadata["_id"]``)."""
+    return str(doc.id or doc.metadata.get("_id"))
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], rrf_k: int = 60) -> list[tuple[str, float]]:
+    """Fuse ranked id lists into ``(id, score)`` pairs, best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+
+    def __init__(self, vector_store, sparse_index, dense_k: int = 4, sparse_k: int = 10, rrf_k: int = 60,
+                 search_kwargs: dict | None = None):
+        self.vector_store = vector_store
+        self.sparse_index = sparse_index
+        self.dense_k = dense_k
+        self.sparse_k = sparse_k
+        self.rrf_k = rrf_k
+        self.search_kwargs = search_kwargs or {}
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid")
+
+    def search_with_scores(self, query: str, k: int = 4, filter: dict | None = None,
+                           query_vector=None) -> list[tuple]:
+        """Top ``k`` ``(Document, rrf score)`` pairs, limited to chunks matching the metadata ``filter``.
+
+        Pass ``query_vector`` when the caller already embedded ``query``, so the dense side doesn't embed it again.
+        """
+        search_kwargs = dict(self.search_kwargs)
+        if filter:
+            search_kwargs["filter"] = store_filter(self.vector_store, filter)
+        if query_vector is not None:
+            dense_future = self._pool.submit(self.vector_store.similarity_search_by_vector,
+                                             [float(value) for value in query_vector],
+                                             k=self.dense_k, **search_kwargs)
+        else:
+            dense_future = self._pool.submit(self.vector_store.similarity_search, query, k=self.dense_k,
+                                             **search_kwargs)
+        sparse_future = self._pool.submit(self.sparse_index.search, query, self.sparse_k, filter)
+        dense_docs = dense_future.result()
+        sparse_hits = sparse_future.result()
+
+        docs = {document_id(doc): doc for doc in dense_docs}
+        fused = reciprocal_rank_fusion(
+            [list(docs), [id_ for id_, _ in sparse_hits]],
+            rrf_k=self.rrf_k,
+        )[:k]
+
+        # Chunks only BM25 found still need their text from the vector store
+        missing = [id_ for id_, _ in fused if id_ not in docs]
+        if missing:
+            docs.update((document_id(doc), doc) for doc in self.vector_store.get_by_ids(missing))
+        return [(docs[id_], score) for id_, score in fused if id_ in docs]
+
+    def search(self, query: str, k: int = 4, filter: dict | None = None, query_vector=None) -> list:
+        return [doc for doc, _ in self.search_with_scores(query, k, filter, query_vector)]
+
+    def close(self):
+        self._pool.shutdown()
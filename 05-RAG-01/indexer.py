@@ -0,0 +1,218 @@
+"""
+Incremental indexing with chunk fingerprints.
+
+Every chunk gets a fingerprint (sha256 of its text and location) and a point
+id derived from it (uuid5), so the same chunk always lands on the same point.
+A manifest of the ids indexed per source is kept next to the index; a run
+only embeds chunks whose id is not in the manifest yet and deletes the points
+whose chunk no longer exists. Editing one page re-embeds that page's chunks
+and nothing else.
+
+The manifest is only rewritten once a run completes, so a run in progress
+also appends the ids of every batch the vector store has accepted to a
+checkpoint file; a run that was killed resumes from it without embedding or
+upserting those chunks again.
+"""
+import hashlib
+import json
+import threading
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+POINT_NAMESPACE = uuid.UUID("6f1c1a52-7d0e-4c55-9b7e-2f1f0c6a8d11")
+FINGERPRINT_METADATA = ("source", "page", "page_label")
+
+
+def chunk_fingerprint(doc) -> str:
+    location = {key: doc.metadata.get(key) for key in FINGERPRINT_METADATA}
+    payload = json.dumps(location, sort_keys=True, default=str) + "\x00" + doc.page_content
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def point_id(fingerprint: str) -> str:
+    """Deterministic UUID (Qdrant only accepts UUIDs or integers as ids)."""
+    return str(uuid.uuid5(POINT_NAMESPACE, fingerprint))
+
+
+@dataclass
+class IndexPlan:
+    new_ids: list = field(default_factory=list)
+    new_docs: list = field(default_factory=list)
+    unchanged: int = 0
+    resumed: int = 0
+    stale_ids: list = field(default_factory=list)
+    sources: dict = field(default_factory=dict)
+
+
+class Manifest:
+    """``{"embedding_model": ..., "sources": {source: [point ids]}}`` stored as JSON."""
+
+    def __init__(self, path, embedding_model: str):
+        self.path = Path(path)
+        self.embedding_model = embedding_model
+        self.sources = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            # Vectors from another model can't be reused: treat everything as new
+            if data.get("embedding_model") == embedding_model:
+                self.sources = {source: set(ids) for source, ids in data.get("sources", {}).items()}
+
+    def known_ids(self) -> set:
+        return set().union(*self.sources.values()) if self.sources else set()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "embedding_model": self.embedding_model,
+            "sources": {source: sorted(ids) for source, ids in sorted(self.sources.items())},
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+
+class Checkpoint:
+    """Append-only JSONL of point ids upserted by an unfinished run (first line names the model)."""
+
+    def __init__(self, path, embedding_model: str):
+        self.path = Path(path)
+        self.embedding_model = embedding_model
+        self._lock = threading.Lock()
+
+    def load(self) -> set:
+        if not self.path.exists():
+            return set()
+        ids = set()
+        with open(self.path, encoding="utf-8") as f:
+            stale = self._read_model(f.readline()) != self.embedding_model
+            if not stale:
+                for line in f:
+                    try:
+                        ids.update(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by the kill: those chunks are simply redone
+        if stale:
+            # Written for another embedding model: start over
+            self.clear()
+        return ids
+
+    @staticmethod
+    def _read_model(header: str):
+        try:
+            return json.loads(header).get("embedding_model")
+        except json.JSONDecodeError:
+            return None
+
+    def record(self, ids: list):
+        with self._lock:
+            new_file = not self.path.exists()
+            if new_file:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if new_file:
+                    f.write(json.dumps({"embedding_model": self.embedding_model}) + "\n")
+                f.write(json.dumps(list(ids)) + "\n")
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+class IncrementalIndexer:
+
+    def __init__(self, vector_store, manifest_path, embedding_model: str, batch_size: int = 64,
+                 checkpoint_path=None, sparse_index=None):
+        self.vector_store = vector_store
+        self.sparse_index = sparse_index
+        self.manifest = Manifest(manifest_path, embedding_model)
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint_path, embedding_model) if checkpoint_path else None
+
+    def begin(self):
+        """Start a streaming run: chunks are then fed through ``filter_new`` in any number of calls."""
+        self._known = self.manifest.known_ids()
+        self._resumed = self.checkpoint.load() - self._known if self.checkpoint else set()
+        self._run = IndexPlan()
+        self._lock = threading.Lock()
+
+    def filter_new(self, chunks) -> tuple[list, list]:
+        """Register ``chunks`` for this run and return ``(ids, docs)`` of the ones to embed."""
+        ids, docs = [], []
+        with self._lock:
+            for doc in chunks:
+                id_ = point_id(chunk_fingerprint(doc))
+                seen = self._run.sources.setdefault(str(doc.metadata.get("source")), set())
+                if id_ in seen:
+                    continue
+                seen.add(id_)
+                if id_ in self._known:
+                    self._run.unchanged += 1
+                elif id_ in self._resumed:
+                    self._run.resumed += 1
+                else:
+                    ids.append(id_)
+                    docs.append(doc)
+            self._run.new_ids.extend(ids)
+        return ids, docs
+
+    def mark_upserted(self, ids: list):
+        """Record ids the vector store has accepted, so a killed run can resume after them."""
+        if self.checkpoint is not None:
+            self.checkpoint.record(ids)
+
+    def stale_ids(self, full_sync: bool = True) -> list:
+        """Points of the manifest whose chunk was not seen in this run.
+
+        With ``full_sync`` the chunks are the whole corpus, so sources that are
+        missing from this run are dropped too; otherwise only the sources seen
+        in this run are reconciled.
+        """
+        stale = []
+        for source, old_ids in self.manifest.sources.items():
+            if source in self._run.sources:
+                stale.extend(old_ids - self._run.sources[source])
+            elif full_sync:
+                stale.extend(old_ids)
+        return stale
+
+    def finish(self, full_sync: bool = True) -> dict:
+        """Delete stale points and save the manifest once every chunk has been upserted."""
+        plan = self._run
+        plan.stale_ids = self.stale_ids(full_sync)
+        if plan.stale_ids:
+            self.vector_store.delete(ids=plan.stale_ids)
+            if self.sparse_index is not None:
+                self.sparse_index.delete(plan.stale_ids)
+
+        if full_sync:
+            self.manifest.sources = plan.sources
+        else:
+            self.manifest.sources.update(plan.sources)
+        self.manifest.save()
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+
+        return {
+            "chunks": plan.unchanged + plan.resumed + len(plan.new_ids),
+            "embedded": len(plan.new_ids),
+            "unchanged": plan.unchanged,
+            "resumed": plan.resumed,
+            "deleted": len(plan.stale_ids),
+        }
+
+    def plan(self, chunks, full_sync: bool = True) -> IndexPlan:
+        """Split ``chunks`` into new and unchanged ones and find stale points."""
+        self.begin()
+        _, self._run.new_docs = self.filter_new(chunks)
+        self._run.stale_ids = self.stale_ids(full_sync)
+        return self._run
+
+    def sync(self, chunks, full_sync: bool = True) -> dict:
+        """Embed and upsert new chunks, delete stale points, then save the manifest."""
+        plan = self.plan(chunks, full_sync=full_sync)
+        if plan.new_docs:
+            self.vector_store.add_documents(plan.new_docs, ids=plan.new_ids, batch_size=self.batch_size)
+            if self.sparse_index is not None:
+                self.sparse_index.add(plan.new_ids, [doc.page_content for doc in plan.new_docs],
+                                      [doc.metadata for doc in plan.new_docs])
+        return self.finish(full_sync=full_sync)
@@ -0,0 +1,148 @@
+"""
+Streaming ingestion: lazy page load -> split -> filter -> batch embed -> batch upsert.
+
+Pages are pulled from ``ParallelPDFLoader.lazy_load`` one at a time and flow
+through bounded queues, so only a fixed number of pages, chunks and vectors
+are alive at once and peak memory no longer grows with the corpus. Every
+stage has its own worker count and queue size. The filter stage drops near
+duplicates and chunks that are already indexed, so embedding batches only
+carry chunks that need a vector. With dedup on, the split stage hands whole
+pages to the filter, which restores load order before deduplicating.
+
+Upserts go out in batches from several workers at once without waiting for
+the store to apply them (Qdrant ``wait=False``), and every accepted batch is
+checkpointed, so a killed run picks up where it stopped. When the indexer
+has a BM25 ``SparseIndex``, upserted chunks are added to it as well.
+
+Environment knobs (all optional)::
+
+    INGEST_SPLIT_WORKERS      threads splitting pages into chunks (2)
+    INGEST_FILTER_WORKERS     threads running dedup / manifest checks (1)
+    INGEST_EMBED_WORKERS      concurrent embedding batches (4)
+    INGEST_UPSERT_WORKERS     vector store writes in flight (4)
+    INGEST_EMBED_BATCH_SIZE   chunks per embedding call (64)
+    INGEST_UPSERT_BATCH_SIZE  points per vector store write (128)
+    INGEST_UPSERT_WAIT        1/true/yes = wait until each write is applied (0)
+    INGEST_QUEUE_SIZE         capacity of each stage's input queue (256)
+"""
+import os
+from dataclasses import dataclass
+
+from chunking import calls_saved
+from indexer import chunk_fingerprint, point_id
+from pipeline import Pipeline, Stage
+from store import upsert_vectors
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+@dataclass
+class IngestConfig:
+    split_workers: int = 2
+    filter_workers: int = 1
+    embed_workers: int = 4
+    upsert_workers: int = 4
+    embed_batch_size: int = 64
+    upsert_batch_size: int = 128
+    upsert_wait: bool = False
+    queue_size: int = 256
+
+    @classmethod
+    def from_env(cls) -> "IngestConfig":
+        defaults = cls()
+        values = {}
+        for name in cls.__dataclass_fields__:
+            raw = os.getenv(f"INGEST_{name.upper()}")
+            default = getattr(defaults, name)
+            if not raw:
+                values[name] = default
+            elif isinstance(default, bool):
+                values[name] = parse_bool(raw, f"INGEST_{name.upper()}")
+            else:
+                values[name] = int(raw)
+        return cls(**values)
+
+
+def parse_bool(raw: str, name: str) -> bool:
+    value = raw.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"{name} must be one of 1/0, true/false, yes/no, on/off; got {raw!r}")
+
+
+def build_pipeline(text_splitter, embedding, vector_store, indexer, config: IngestConfig, dedup=None) -> Pipeline:
+    """Chain the stages; ``indexer`` must have been started with ``begin()``."""
+    sparse_index = indexer.sparse_index
+
+    def split(page):
+        return text_splitter.split_documents([page])
+
+    def filter_chunk(chunk):
+        # Chunks already in the index never reach an embedding batch
+        ids, docs = indexer.filter_new([chunk])
+        if not ids and sparse_index is not None:
+            # Indexed before the BM25 index (or its metadata columns) existed: backfill it without re-embedding
+            id_ = point_id(chunk_fingerprint(chunk))
+            if not sparse_index.has_metadata(id_):
+                sparse_index.add([id_], [chunk.page_content], [chunk.metadata])
+        return list(zip(ids, docs))
+
+    if dedup is not None:
+        # Split workers finish pages out of order; pages travel with their load-order
+        # number so dedup keeps the same representative of a near-duplicate group on every run
+        def split(item):
+            sequence, page = item
+            return [(sequence, text_splitter.split_documents([page]))]
+
+        def filter_page(item):
+            # Near duplicates are dropped before the manifest check, so they never reach an embedding batch
+            return [point for chunk in dedup.release(*item) for point in filter_chunk(chunk)]
+
+    def embed(chunks):
+        ids, docs = zip(*chunks)
+        vectors = embedding.embed_documents([doc.page_content for doc in docs])
+        return list(zip(ids, docs, vectors))
+
+    def upsert(points):
+        ids, docs, vectors = zip(*points)
+        upsert_vectors(vector_store, list(ids), list(docs), list(vectors), wait=config.upsert_wait)
+        if sparse_index is not None:
+            sparse_index.add(list(ids), [doc.page_content for doc in docs], [doc.metadata for doc in docs])
+        indexer.mark_upserted(ids)
+        return []
+
+    return Pipeline([
+        Stage("split", split, workers=config.split_workers, queue_size=config.queue_size),
+        Stage("filter", filter_page if dedup is not None else filter_chunk, workers=config.filter_workers, queue_size=config.queue_size),
+        Stage("embed", embed, workers=config.embed_workers, queue_size=config.queue_size,
+              batch_size=config.embed_batch_size),
+        Stage("upsert", upsert, workers=config.upsert_workers, queue_size=config.queue_size,
+              batch_size=config.upsert_batch_size),
+    ])
+
+
+def ingest(pages, text_splitter, embedding, vector_store, indexer, config: IngestConfig | None = None,
+           full_sync: bool = True, dedup=None) -> dict:
+    """Index an iterable of pages and return ``{"index", "pipeline", "chunking", "dedup"}`` stats.
+
+    ``text_splitter`` may be a ``chunking.Chunker`` (its stats are reported) or
+    any LangChain splitter; ``dedup`` is an optional ``NearDuplicateFilter``.
+    """
+    config = config or IngestConfig.from_env()
+    indexer.begin()
+    pipeline = build_pipeline(text_splitter, embedding, vector_store, indexer, config, dedup=dedup)
+    report = pipeline.run(enumerate(pages) if dedup is not None else pages, source_name="load")
+    # Stale points are only known once every chunk has been seen
+    stats = {"index": indexer.finish(full_sync=full_sync), "pipeline": report}
+    if hasattr(text_splitter, "stats"):
+        stats["chunking"] = text_splitter.stats.as_dict(config.embed_batch_size)
+    if dedup is not None:
+        kept = stats["index"]["embedded"]
+        stats["dedup"] = {
+            **dedup.stats.as_dict(),
+            "embedding_calls_saved": calls_saved(kept + dedup.stats.dropped, kept, config.embed_batch_size),
+        }
+    return stats
@@ -1,52 +1,96 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
 import google.generativeai as genai
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.embeddings import cached_langchain_embeddings
+from common.providers import embedding_cache_key, get_embeddings
+from chunking import Chunker
+from dedup import NearDuplicateFilter
+from indexer import IncrementalIndexer
+from ingest import IngestConfig, ingest
+from pdf_loader import ParallelPDFLoader
+from sparse_index import SparseIndex
+from store import checkpoint_path, manifest_path, open_vector_store, sparse_index_path
 
 load_dotenv()
 genai.configure(api_key = os.getenv("GOOGLE_API_KEY"))
 
-# -------------- STEP 1 : Read Document -------------
+# QUANTIZATION = int8 (4x smaller) | binary (32x smaller) | unset (full precision)
+QUANTIZATION = os.getenv("QUANTIZATION")
+
+# PDF_SOURCE = a PDF file, a directory of PDFs or a glob such as "manuals/**/*.pdf"
+PDF_SOURCE = os.getenv("PDF_SOURCE", str(Path(__file__).parent/"nodejs.pdf"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or None
+
+
+def main():
+    # Pages stream through bounded queues (load -> split -> embed -> upsert),
+    # so memory stays flat however many PDFs are indexed
 
-file_path = Path(__file__).parent/"nodejs.pdf"
+    # -------------- STEP 1 : Read Document -------------
 
+    # Pages are extracted in a process pool and come back in order with PyPDFLoader's metadata
+    loader = ParallelPDFLoader(PDF_SOURCE, max_workers=PDF_WORKERS)
+    pages = loader.lazy_load() # Read PDF files, one page at a time
 
-loader = PyPDFLoader(file_path= file_path)
-docs = loader.load() # Read PDF file
 
-# print("\n---- Docs[5] : ----\n ", docs[5])
 
+    # -------------- STEP 2 : Chunking -------------
 
+    # CHUNK_MODE=characters : 1000 chars / 400 overlap (default)
+    # CHUNK_MODE=tokens     : CHUNK_TOKENS / CHUNK_OVERLAP_TOKENS measured with the tokenizer
+    text_splitter = Chunker.from_env()
 
-# -------------- STEP 2 : Chunking -------------
+    # Repeated headers/footers and boilerplate chunks are dropped before embedding
+    # (NEAR_DUP_THRESHOLD=0 disables the filter)
+    dedup = NearDuplicateFilter.from_env()
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size = 1000,
-    chunk_overlap = 400
-)
 
-split_docs = text_splitter.split_documents(documents=docs)
+    # -------------- STEP 3 : Vector Embedding -------------
 
+    # Identical chunks are embedded once and vectors are cached on disk by (model, sha256(text)),
+    # so re-indexing the same PDFs only pays for new or changed chunks.
+    embedding_model = cached_langchain_embeddings(
+        get_embeddings(model="models/embedding-001"),   # EMBEDDING_PROVIDER=fake for offline runs
+        model=embedding_cache_key("models/embedding-001"),
+        cache_path=Path(__file__).parent / ".cache" / "embeddings.sqlite"
+    )
 
-# -------------- STEP 3 : Vector Embedding -------------
+    # Using [embedding_model] create embeddings of the chunks and store in vector DB
+    # (VECTOR_STORE=local : in-process memory-mapped index, no Qdrant server needed)
 
-embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001"
-)
+    vector_store = open_vector_store(embedding_model, quantization=QUANTIZATION)
 
-# Using [embedding_model] create embeddings of [split_docs] and store in vector DB
+    # Point ids are derived from chunk fingerprints: only new/changed chunks are embedded
+    # and points of chunks that disappeared are deleted. Upserted batches are checkpointed,
+    # so re-running after a crash resumes instead of starting over
+    indexer = IncrementalIndexer(
+        vector_store,
+        manifest_path=manifest_path(),
+        embedding_model=embedding_cache_key("models/embedding-001"),
+        checkpoint_path=checkpoint_path(),
+        sparse_index=SparseIndex(sparse_index_path())   # BM25 postings for hybrid search in chat.py
+    )
 
-vector_store = QdrantVectorStore.from_documents(
-        documents=split_docs,
-        url = "http://localhost:6333",
-        collection_name = "learning_vectors",
-        embedding=embedding_model
-)
+    # Workers, batch sizes and queue sizes per stage come from INGEST_* (see ingest.py)
+    stats = ingest(pages, text_splitter, embedding_model, vector_store, indexer, IngestConfig.from_env(), dedup=dedup)
 
-print("Indexing of Documents Done........")
+    print(f"Loaded {stats['pipeline']['stages']['load']['items_out']} pages from {len(loader.paths)} PDF file(s)")
+    print("Indexing of Documents Done........")
+    print("Index stats : ", stats["index"])
+    print("Chunking stats : ", stats["chunking"])
+    if dedup is not None:
+        print("Near-duplicate stats : ", stats["dedup"])
+    print("Embedding stats : ", embedding_model.client.stats.as_dict())
+    print(f"Pipeline ({stats['pipeline']['wall_seconds']}s) :")
+    for name, stage in stats["pipeline"]["stages"].items():
+        print(f"   {name:<7} {stage}")
 
 
+# The guard keeps worker processes of the PDF loader from re-running the indexer
+if __name__ == "__main__":
+    main()
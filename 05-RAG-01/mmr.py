@@ -0,0 +1,105 @@
+"""
+Maximal marginal relevance re-ranking.
+
+With a 400-char overlap, neighbouring chunks of the same page are near
+copies, and plain top-k search happily returns three of them. MMR over-fetches
+candidates and then picks, one at a time, the candidate with the best
+``lambda * relevance - (1 - lambda) * max similarity to what is already picked``.
+
+The candidate-candidate similarity matrix is computed once (one mat-mul) and
+the "max similarity to the picked set" is kept as a running vector updated
+with a single ``np.maximum`` per pick, so selecting k of n costs k vector ops
+instead of LangChain's k * n Python-level comparisons.
+
+Relevance comes from the retriever that produced the candidates: the RRF
+scores of a hybrid search when given, otherwise cosine similarity to the
+query. A candidate whose vector can't be fetched (e.g. BM25 found it in a
+stale sparse index) stays in the running with its retriever rank as relevance
+and no redundancy penalty, instead of being dropped.
+"""
+import numpy as np
+
+from hybrid import document_id
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr_select(query_vector, candidates, k: int = 4, lambda_mult: float = 0.5, relevance=None) -> list[int]:
+    """Indices of ``k`` rows of ``candidates`` chosen by MMR, in pick order.
+
+    ``relevance`` (one value per row, higher is better) replaces cosine similarity to the query.
+    """
+    candidates = _normalize(np.asarray(candidates, dtype=np.float32))
+    if len(candidates) == 0:
+        return []
+    if relevance is None:
+        relevance = candidates @ _normalize(np.asarray(query_vector, dtype=np.float32))
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = candidates @ candidates.T
+
+    picked = [int(np.argmax(relevance))]
+    redundancy = similarity[picked[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[picked[0]] = False
+    while len(picked) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def candidate_vectors(vector_store, ids: list) -> dict:
+    """Stored vectors of ``ids`` keyed by id (missing ids are left out)."""
+    if hasattr(vector_store, "index"):
+        # LocalVectorStore: rows of the memory-mapped matrix
+        index = vector_store.index
+        present = [id_ for id_ in ids if index is not None and id_ in index.rows]
+        return dict(zip(present, index.vectors(present))) if present else {}
+
+    points = vector_store.client.retrieve(vector_store.collection_name, ids, with_vectors=True, with_payload=False)
+    vectors = {}
+    for point in points:
+        vector = point.vector
+        if isinstance(vector, dict):
+            vector = vector.get(vector_store.vector_name)
+        vectors[str(point.id)] = vector
+    return vectors
+
+
+def mmr_rerank(vector_store, query_vector, docs: list, k: int = 4, lambda_mult: float = 0.5,
+               scores=None) -> list:
+    """Diversify over-fetched search results down to ``k`` documents.
+
+    ``docs`` are in retriever order; ``scores`` are their fused (e.g. RRF) scores, if any.
+    """
+    if len(docs) <= 1:
+        return docs[:k]
+    ids = [document_id(doc) for doc in docs]
+    vectors = candidate_vectors(vector_store, ids)
+    found = [vectors.get(id_) for id_ in ids]
+    present = [vector for vector in found if vector is not None]
+    if not present:
+        return docs[:k]
+
+    if scores is not None:
+        # Scaled to [0, 1] like cosine similarity, so lambda_mult keeps its meaning
+        relevance = np.asarray(scores, dtype=np.float32)
+        relevance = relevance / (relevance.max() or 1)
+    elif len(present) < len(docs):
+        # Cosine can't rank a candidate without a vector: fall back to the retriever's order
+        relevance = 1 - np.arange(len(docs), dtype=np.float32) / len(docs)
+    else:
+        relevance = None
+    # A zero row has no similarity to anything, so a vector-less candidate is never penalized as redundant
+    dim = len(present[0])
+    matrix = np.stack([np.asarray(vector, dtype=np.float32) if vector is not None else np.zeros(dim, np.float32)
+                       for vector in found])
+    picked = mmr_select(query_vector, matrix, k=k, lambda_mult=lambda_mult, relevance=relevance)
+    return [docs[index] for index in picked]
@@ -0,0 +1,110 @@
+"""
+Parallel PDF loading.
+
+Text extraction is CPU-bound, so pages are extracted in a process pool:
+every file is split into page ranges, each range is one task, and documents
+are yielded back in file/page order with the same metadata ``PyPDFLoader``
+produces (``source``, ``page``, ``page_label``, ``total_pages`` plus the PDF
+info fields).
+"""
+import glob
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+try:
+    # Private pypdf helper: the label of one page, without computing every page's label
+    from pypdf._page_labels import index2label
+except ImportError:
+    index2label = None
+
+
+def _is_pdf(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() == ".pdf"
+
+
+def resolve_pdf_paths(source) -> list[Path]:
+    """A PDF file, a directory (searched recursively) or a glob pattern -> sorted PDF paths."""
+    sources = [source] if isinstance(source, (str, Path)) else list(source)
+    paths = []
+    for item in sources:
+        path = Path(item)
+        if path.is_dir():
+            # rglob("*.pdf") is case-sensitive on POSIX and would skip "REPORT.PDF"
+            paths.extend(sorted(match for match in path.rglob("*") if _is_pdf(match)))
+        elif path.is_file():
+            paths.append(path)
+        else:
+            paths.extend(match for match in map(Path, sorted(glob.glob(str(item), recursive=True))) if _is_pdf(match))
+    if not paths:
+        raise FileNotFoundError(f"No PDF files found for {source!r}")
+    return paths
+
+
+def _document_metadata(reader: PdfReader) -> dict:
+    info = reader.metadata or {}
+    return {key.lstrip("/").lower(): str(value) for key, value in info.items()}
+
+
+def extract_pages(path: str, start: int, end: int) -> list[tuple[str, dict]]:
+    """Extract pages ``[start, end)`` of one PDF (runs in a worker process)."""
+    reader = PdfReader(path)
+    base = _document_metadata(reader)
+    total_pages = len(reader.pages)
+    # Without the private helper, fall back to the public list (every page's label, once per task)
+    labels = reader.page_labels if index2label is None else None
+    pages = []
+    for index in range(start, min(end, total_pages)):
+        metadata = {
+            **base,
+            "source": path,
+            "total_pages": total_pages,
+            "page": index,
+            "page_label": index2label(reader, index) if labels is None else labels[index],
+        }
+        pages.append((reader.pages[index].extract_text() or "", metadata))
+    return pages
+
+
+class ParallelPDFLoader:
+    """Load one or many PDFs with page ranges spread over a process pool."""
+
+    def __init__(self, source, max_workers: int | None = None, pages_per_task: int = 16):
+        self.paths = resolve_pdf_paths(source)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+
+    def tasks(self):
+        for path in self.paths:
+            total_pages = len(PdfReader(path).pages)
+            for start in range(0, total_pages, self.pages_per_task):
+                yield str(path), start, start + self.pages_per_task
+
+    def lazy_load(self):
+        """Yield documents in order while keeping a bounded number of tasks in flight."""
+        if self.max_workers == 1:
+            for task in self.tasks():
+                for text, metadata in extract_pages(*task):
+                    yield Document(page_content=text, metadata=metadata)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight = deque()
+            for task in self.tasks():
+                in_flight.append(pool.submit(extract_pages, *task))
+                if len(in_flight) >= self.max_workers * 2:
+                    yield from self._documents(in_flight.popleft().result())
+            while in_flight:
+                yield from self._documents(in_flight.popleft().result())
+
+    @staticmethod
+    def _documents(pages):
+        for text, metadata in pages:
+            yield Document(page_content=text, metadata=metadata)
+
+    def load(self) -> list[Document]:
+        return list(self.lazy_load())
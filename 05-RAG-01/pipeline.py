@@ -0,0 +1,200 @@
+"""
+A small staged pipeline: threads connected by bounded queues.
+
+Each ``Stage`` runs ``workers`` threads that take items (or batches of
+``batch_size`` items) from its input queue, call ``fn`` and push every output
+to the next stage's queue. Queues are bounded, so a slow stage blocks the ones
+before it (backpressure) and the number of items alive at once - and with it
+peak memory - stays constant whatever the input size.
+"""
+import math
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    calls: int = 0
+    busy_seconds: float = 0.0
+    latencies: list = field(default_factory=list)
+
+    def percentile_ms(self, q: float) -> float:
+        """Latency of one ``fn`` call at percentile ``q`` (nearest rank), in milliseconds."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return round(ordered[rank] * 1000, 3)
+
+    def as_dict(self, wall_seconds: float) -> dict:
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "calls": self.calls,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items_in / wall_seconds, 1) if wall_seconds else 0.0,
+            "latency_ms": {f"p{q}": self.percentile_ms(q) for q in (50, 95, 99)},
+        }
+
+
+class Stage:
+    """``fn(item)`` (or ``fn(list_of_items)`` when ``batch_size`` is set) returns an iterable of outputs."""
+
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = 64, batch_size: int | None = None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.stats = StageStats(name)
+        self._lock = threading.Lock()
+
+    def record(self, items_in: int, items_out: int, seconds: float):
+        with self._lock:
+            self.stats.items_in += items_in
+            self.stats.items_out += items_out
+            self.stats.calls += 1
+            self.stats.busy_seconds += seconds
+            self.stats.latencies.append(seconds)
+
+
+class Pipeline:
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = stages
+        self._error = None
+        self._stop = threading.Event()
+
+    def run(self, source, source_name: str = "source") -> dict:
+        """Feed ``source`` through every stage and return per-stage throughput."""
+        source_stats = StageStats(source_name)
+        threads = []
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            remaining = [stage.workers]
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage, downstream, remaining), daemon=True,
+                                          name=f"{stage.name}-worker")
+                thread.start()
+                threads.append(thread)
+
+        start = time.perf_counter()
+        first = self.stages[0]
+        iterator = iter(source)
+        while not self._stop.is_set():
+            fetch_start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            except Exception as e:
+                self._fail(e)
+                break
+            elapsed = time.perf_counter() - fetch_start
+            source_stats.items_in += 1
+            source_stats.items_out += 1
+            source_stats.calls += 1
+            source_stats.busy_seconds += elapsed
+            source_stats.latencies.append(elapsed)
+            if not self._put(first.inbox, item):
+                break
+        for _ in range(first.workers):
+            self._put(first.inbox, _DONE)
+
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+
+        report = {"wall_seconds": round(wall, 3), "stages": {source_name: source_stats.as_dict(wall)}}
+        for stage in self.stages:
+            report["stages"][stage.name] = stage.stats.as_dict(wall)
+        return report
+
+    # ------------------------------ internals ------------------------------
+
+    def _put(self, inbox: queue.Queue, item) -> bool:
+        # Blocking put that still notices a failure elsewhere in the pipeline
+        while not self._stop.is_set() or item is _DONE:
+            try:
+                inbox.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if item is _DONE and self._stop.is_set():
+                    return False
+        return False
+
+    def _fail(self, error: Exception):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _get(self, inbox: queue.Queue):
+        # Blocking get that gives up once the pipeline has failed
+        while True:
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _take(self, stage: Stage):
+        """Next item or batch for ``stage``; ``_DONE`` once its input is exhausted."""
+        item = self._get(stage.inbox)
+        if stage.batch_size is None or item is _DONE:
+            return item
+        batch = [item]
+        while len(batch) < stage.batch_size:
+            item = self._get(stage.inbox)
+            if item is _DONE:
+                # Hand the sentinel back so this worker stops after flushing the batch
+                if not self._stop.is_set():
+                    stage.inbox.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self, stage: Stage, downstream: Stage | None, remaining: list):
+        while True:
+            item = self._take(stage)
+            if item is _DONE or self._stop.is_set():
+                break
+            started = time.perf_counter()
+            try:
+                outputs = list(stage.fn(item) or ())
+            except Exception as e:
+                self._fail(e)
+                break
+            stage.record(len(item) if stage.batch_size else 1, len(outputs), time.perf_counter() - started)
+            if downstream is not None:
+                for output in outputs:
+                    if not self._put(downstream.inbox, output):
+                        break
+
+        # The last worker of a stage tells the next stage that its input is complete
+        with stage._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and downstream is not None:
+            for _ in range(downstream.workers):
+                self._put(downstream.inbox, _DONE)
+        if self._stop.is_set():
+            self._drain(stage)
+
+    @staticmethod
+    def _drain(stage: Stage):
+        # Unblock producers stuck on a full queue after a failure
+        try:
+            while True:
+                stage.inbox.get_nowait()
+        except queue.Empty:
+            pass
@@ -0,0 +1,173 @@
+"""
+Persisted BM25 inverted index.
+
+``rank_bm25.BM25Okapi`` keeps the whole tokenized corpus in memory and scores
+every document for every query term. Here postings are stored per term in
+SQLite, written at ingest time next to the vector collection, so a query only
+reads the postings of its own terms. Scoring is Okapi BM25 (k1=1.5, b=0.75,
+the ``rank_bm25`` defaults) with the non-negative Lucene idf.
+
+Tokens keep dotted identifiers whole *and* split (``fs.readFile`` ->
+``fs.readfile``, ``fs``, ``readfile``), so exact API names in the Node.js PDF
+match precisely.
+
+Each document also keeps its ``source``, ``page`` and ``page_label``, so a
+search can be restricted to some manuals or pages before anything is scored.
+"""
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+# Metadata kept per document for filtered search, and the SQL for range conditions
+FILTER_COLUMNS = ("source", "page", "page_label")
+_RANGE_SQL = {"gte": ">=", "gt": ">", "lte": "<=", "lt": "<"}
+
+_TOKEN = re.compile(r"[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*|\d+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in _TOKEN.findall(text):
+        token = match.lower()
+        tokens.append(token)
+        if "." in token:
+            tokens.extend(token.split("."))
+    return tokens
+
+
+class SparseIndex:
+    """BM25 over an SQLite inverted index: ``postings(term, id, tf)`` plus document lengths."""
+
+    def __init__(self, path, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " id TEXT PRIMARY KEY, length INTEGER NOT NULL, source TEXT, page INTEGER, page_label TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(docs)")}
+        for column, kind in (("source", "TEXT"), ("page", "INTEGER"), ("page_label", "TEXT")):
+            if column not in columns:
+                # Index written before metadata was stored: rows stay searchable and are re-tagged on the next ingest
+                self._conn.execute(f"ALTER TABLE docs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS docs_by_source ON docs (source, page)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL,"
+            " PRIMARY KEY (term, id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_by_id ON postings (id)")
+        self._conn.commit()
+        # Lengths are small and needed for every scored document, so they live in memory
+        self._lengths = dict(self._conn.execute("SELECT id, length FROM docs"))
+        self._total_length = sum(self._lengths.values())
+        self._untagged = {row[0] for row in self._conn.execute("SELECT id FROM docs WHERE source IS NULL")}
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def __contains__(self, id_) -> bool:
+        return id_ in self._lengths
+
+    def has_metadata(self, id_) -> bool:
+        """Whether ``id_`` is indexed together with its source and page (older indexes lack them)."""
+        return id_ in self._lengths and id_ not in self._untagged
+
+    # ------------------------------ writes ------------------------------
+
+    def add(self, ids: list, texts: list, metadatas: list | None = None):
+        """Insert or replace documents; ``metadatas`` supplies the filterable fields."""
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            self._delete(ids)
+            for id_, text, metadata in zip(ids, texts, metadatas):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._conn.execute(
+                    "INSERT INTO docs (id, length, source, page, page_label) VALUES (?, ?, ?, ?, ?)",
+                    (id_, length, *(metadata.get(column) for column in FILTER_COLUMNS)),
+                )
+                if metadata.get("source") is None:
+                    self._untagged.add(id_)
+                self._conn.executemany(
+                    "INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)",
+                    [(term, id_, tf) for term, tf in counts.items()],
+                )
+                self._lengths[id_] = length
+                self._total_length += length
+            self._conn.commit()
+
+    def delete(self, ids: list):
+        with self._lock:
+            self._delete(ids)
+            self._conn.commit()
+
+    def _delete(self, ids):
+        present = [id_ for id_ in ids if id_ in self._lengths]
+        if not present:
+            return
+        self._conn.executemany("DELETE FROM postings WHERE id = ?", [(id_,) for id_ in present])
+        self._conn.executemany("DELETE FROM docs WHERE id = ?", [(id_,) for id_ in present])
+        for id_ in present:
+            self._total_length -= self._lengths.pop(id_)
+            self._untagged.discard(id_)
+
+    # ------------------------------ search ------------------------------
+
+    def _matching_ids(self, filter: dict) -> set:
+        clauses, params = [], []
+        for column, condition in filter.items():
+            if column not in FILTER_COLUMNS:
+                raise ValueError(f"BM25 index can't filter on {column!r}; use one of {FILTER_COLUMNS}.")
+            if isinstance(condition, dict):
+                for op, bound in condition.items():
+                    clauses.append(f"{column} {_RANGE_SQL[op]} ?")
+                    params.append(bound)
+            elif isinstance(condition, (list, tuple)):
+                clauses.append(f"{column} IN ({', '.join('?' for _ in condition)})")
+                params.extend(condition)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(condition)
+        where = " AND ".join(clauses) or "1"
+        return {row[0] for row in self._conn.execute(f"SELECT id FROM docs WHERE {where}", params)}
+
+    def search(self, query: str, k: int = 10, filter: dict | None = None) -> list[tuple[str, float]]:
+        """Top ``k`` ``(id, bm25 score)`` pairs, best first.
+
+        ``filter`` uses the ``LocalVectorStore`` form (``{"source": [...], "page": {"gte": 99}}``);
+        documents outside it are never scored.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self._lengths:
+            return []
+        with self._lock:
+            allowed = self._matching_ids(filter) if filter else None
+            if allowed is not None and not allowed:
+                return []
+            n = len(self._lengths)
+            avg_length = self._total_length / n
+            scores = Counter()
+            for term in terms:
+                postings = self._conn.execute("SELECT id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for id_, tf in postings:
+                    if allowed is not None and id_ not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[id_] / avg_length)
+                    scores[id_] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores.most_common(k)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
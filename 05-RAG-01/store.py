@@ -0,0 +1,120 @@
+"""
+Open the ``learning_vectors`` collection on the configured backend.
+
+``VECTOR_STORE=local`` uses the in-process memory-mapped index, anything else
+the Qdrant server. The collection is created on first use, together with the
+payload indexes that filtered searches rely on.
+"""
+import json
+from pathlib import Path
+
+from langchain_qdrant import QdrantVectorStore
+
+from common.local_store import LocalVectorStore, use_local_store
+from common.quantization import qdrant_quantization_config
+
+QDRANT_URL = "http://localhost:6333"
+COLLECTION_NAME = "learning_vectors"
+LOCAL_INDEX_DIR = Path(__file__).parent/".index"/COLLECTION_NAME
+
+# Payload fields indexed at creation time, so a search filtered on them only visits matching points
+PAYLOAD_INDEXES = {
+    "metadata.source": "keyword",
+    "metadata.page_label": "keyword",
+    "metadata.page": "integer",     # page ranges ("pages:100-200") need an integer field
+}
+
+
+def _backend_file(suffix: str) -> Path:
+    # Each backend holds its own points, so it keeps its own bookkeeping files
+    backend = "local" if use_local_store() else "qdrant"
+    return Path(__file__).parent/".index"/f"{COLLECTION_NAME}.{backend}.{suffix}"
+
+
+def manifest_path() -> Path:
+    """Indexing manifest of the selected backend."""
+    return _backend_file("manifest.json")
+
+
+def sparse_index_path() -> Path:
+    """BM25 inverted index kept in step with the selected backend's points."""
+    return _backend_file("bm25.sqlite")
+
+
+def checkpoint_path() -> Path:
+    """Progress of an unfinished ingestion run on the selected backend."""
+    return _backend_file("checkpoint.jsonl")
+
+
+def indexed_sources() -> list[str]:
+    """Sources recorded in the selected backend's manifest."""
+    path = manifest_path()
+    if not path.exists():
+        return []
+    return sorted(json.loads(path.read_text(encoding="utf-8")).get("sources", {}))
+
+
+def ensure_payload_indexes(vector_store, indexes: dict = PAYLOAD_INDEXES):
+    """Create the payload indexes a collection doesn't have yet (collections made before they were declared)."""
+    if isinstance(vector_store, LocalVectorStore):
+        index = vector_store.index
+        if index is None:
+            return
+        for field, schema in indexes.items():
+            if field not in index.payload_indexes:
+                index.create_payload_index(field, schema)
+        return
+
+    from qdrant_client import models
+
+    existing = vector_store.client.get_collection(vector_store.collection_name).payload_schema or {}
+    for field, schema in indexes.items():
+        if field not in existing:
+            vector_store.client.create_payload_index(
+                vector_store.collection_name, field_name=field, field_schema=models.PayloadSchemaType(schema)
+            )
+
+
+def open_vector_store(embedding, quantization: str | None = None, oversampling: float = 4.0):
+    if use_local_store():
+        return LocalVectorStore(LOCAL_INDEX_DIR, embedding, quantization=quantization, oversampling=oversampling,
+                                payload_indexes=PAYLOAD_INDEXES)
+
+    quantization_config = qdrant_quantization_config(quantization)
+    vector_store = QdrantVectorStore.construct_instance(
+        embedding=embedding,
+        collection_name=COLLECTION_NAME,
+        client_options={"url": QDRANT_URL},
+        # Quantized codes stay in RAM, original vectors move to disk for rescoring
+        collection_create_options={"quantization_config": quantization_config} if quantization_config else None,
+        vector_params={"on_disk": True} if quantization_config else None,
+    )
+    ensure_payload_indexes(vector_store)
+    return vector_store
+
+
+def upsert_vectors(vector_store, ids: list, docs: list, vectors: list, wait: bool = True):
+    """Write chunks whose vectors were computed elsewhere (the ingestion pipeline embeds in its own stage).
+
+    With ``wait=False`` Qdrant acknowledges the batch once it is in its write-ahead
+    log instead of after it has been applied, so the next batch can go out at once.
+    """
+    if isinstance(vector_store, LocalVectorStore):
+        texts = [doc.page_content for doc in docs]
+        vector_store.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in docs], ids=ids)
+        return
+
+    from qdrant_client import models
+
+    points = [
+        models.PointStruct(
+            id=id_,
+            vector={vector_store.vector_name: vector},
+            payload={
+                vector_store.content_payload_key: doc.page_content,
+                vector_store.metadata_payload_key: doc.metadata,
+            },
+        )
+        for id_, doc, vector in zip(ids, docs, vectors)
+    ]
+    vector_store.client.upsert(collection_name=vector_store.collection_name, points=points, wait=wait)
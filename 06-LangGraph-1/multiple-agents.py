@@ -5,9 +5,15 @@ from dotenv import load_dotenv
 from google import genai
 from pydantic import BaseModel, ValidationError
 import google.generativeai as genai
+import sys
+from pathlib import Path
 import json
 import os
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.providers import get_generative_model
+
 
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
@@ -50,7 +56,7 @@ def classify_message(state: State):
     }
     """
 
-    model = genai.GenerativeModel(
+    model = get_generative_model(
         model_name= "gemini-2.0-flash",
         system_instruction= SYSTEM_PROMPT,
         generation_config={
@@ -82,7 +88,7 @@ def general_query(state: State):
     print("     ⚠️  general_query")
     query = state["query"]
 
-    model = genai.GenerativeModel(
+    model = get_generative_model(
         model_name= "gemini-2.0-flash",
       )
 
@@ -103,7 +109,7 @@ def coding_query(state: State):
         You are a Coding Expert Agent. Write a best and optimized code.
     """
 
-    model = genai.GenerativeModel(
+    model = get_generative_model(
         model_name= "gemini-2.0-flash",
         system_instruction= SYSTEM_PROMPT,
         )
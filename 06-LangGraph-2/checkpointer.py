@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+from pathlib import Path
 from typing import Annotated
 from dotenv import load_dotenv
 import google.generativeai as genai
@@ -9,6 +11,11 @@ from langgraph.graph.message import add_messages
 from langchain_core.messages import AIMessage
 from langgraph.checkpoint.mongodb import MongoDBSaver
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.history import count_messages
+from common.providers import get_generative_model
+
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
@@ -21,7 +28,7 @@ class State(TypedDict):
 # -----------------------------------------------------------------
 
 def chat_node(state: State):
-    model = genai.GenerativeModel(
+    model = get_generative_model(
         model_name="gemini-2.0-flash",
         generation_config={
             "response_mime_type": "application/json",
@@ -38,6 +45,9 @@ def chat_node(state: State):
         else:
             print(f"⚠️ Skipping unsupported message type: {msg.type}")
 
+    # Token counts are memoized per message, so only the new turn gets encoded here
+    print(f"   🧮 Context : {count_messages(gemini_messages)} tokens")
+
     # Now pass the formatted messages
     response = model.generate_content(gemini_messages)
 
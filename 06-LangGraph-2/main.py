@@ -2,12 +2,19 @@ import os
 from typing import Annotated
 from dotenv import load_dotenv
 import google.generativeai as genai
+import sys
+from pathlib import Path
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain_core.messages import AIMessage
 from langchain.chat_models import init_chat_model
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.providers import get_generative_model
+from common.streaming import send_streaming
+
 
 load_dotenv()
 
@@ -18,7 +25,7 @@ class State(TypedDict):
 
 
 def chat_node(state: State):
-    model = genai.GenerativeModel(
+    model = get_generative_model(
         model_name= "gemini-2.0-flash",        
         generation_config={
             "response_mime_type":"application/json",            
@@ -30,9 +37,11 @@ def chat_node(state: State):
     # Extract user message content (string)
     user_msg = state["messages"][-1].content  # Assuming last message is from user
 
-    response = chat.send_message(user_msg)
+    # The reply is rendered token by token while the node runs
+    reply, timing = send_streaming(chat, user_msg)
+    print(f"   {timing.summary()}")
     # return {"messages": [response.text]} 
-    return {"messages": [AIMessage(content=response.text)]}
+    return {"messages": [AIMessage(content=reply)]}
     
 
 graph_builder = StateGraph(State)
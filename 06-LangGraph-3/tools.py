@@ -4,14 +4,19 @@ import json
 from typing import Annotated
 from dotenv import load_dotenv
 import google.generativeai as genai
+import sys
+from pathlib import Path
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain_core.messages import AIMessage
 from langchain_core.tools import tool
-from langchain.chat_models import init_chat_model
 from langgraph.prebuilt import ToolNode, tools_condition
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.providers import get_chat_model
+
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
@@ -56,7 +61,7 @@ tools_fun = [get_weather,add_two_numbers]
 
 # -------------------------------- model -------------------------------------------------------
 
-llm = init_chat_model("google_genai:gemini-2.0-flash")
+llm = get_chat_model("google_genai:gemini-2.0-flash")
 llm_with_tools = llm.bind_tools(tools_fun)
 
 # -------------------------- nodes / functions ---------------------------------------------------
@@ -1,18 +1,23 @@
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
-from langchain.chat_models import init_chat_model
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.checkpoint.mongodb import MongoDBSaver
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import AIMessage
 import google.generativeai as genai
+import sys
+from pathlib import Path
 from typing import Annotated
 from dotenv import load_dotenv
 import os
 import json
 from langgraph.types import interrupt,Command
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.providers import get_chat_model
+
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
@@ -36,7 +41,7 @@ tools_fun = [human_assistance]
 
 # ----------------------------------- llm models -----------------------------------------------
 
-llm = init_chat_model("google_genai:gemini-2.0-flash",model_kwargs={"response_format": "text"})
+llm = get_chat_model("google_genai:gemini-2.0-flash",model_kwargs={"response_format": "text"})
 llm_with_tools = llm.bind_tools(tools_fun)
 
 
@@ -1,9 +1,17 @@
 import os
+import sys
 import json
+from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
 from mem0 import Memory
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.local_store import LocalVectorStore, use_local_store
+from common.providers import get_generative_model, mem0_config
+from common.streaming import send_streaming
+
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
@@ -45,7 +53,18 @@ config = {
 
 }
 
-mem_client = Memory.from_config(config)
+if use_local_store():
+    # VECTOR_STORE=local : keep memories in an in-process memory-mapped index instead of Qdrant
+    config["vector_store"] = {
+        "provider": "langchain",
+        "config": {
+            "client": LocalVectorStore(Path(__file__).parent/".index"/"mem0", embedding=None, dim=768),
+            "collection_name": "mem0"
+        }
+    }
+
+# LLM_PROVIDER=fake / EMBEDDING_PROVIDER=fake run mem0 without calling Gemini
+mem_client = Memory.from_config(mem0_config(config))
 
 
 
@@ -70,16 +89,16 @@ def chat():
             """
 
         try:
-            model = genai.GenerativeModel(model_name="gemini-2.0-flash",system_instruction=SYSTEM_PROMPT)
+            model = get_generative_model(model_name="gemini-2.0-flash",system_instruction=SYSTEM_PROMPT)
             chat = model.start_chat()    
-            response = chat.send_message(user_query)
-
-            print(" 🤖 : ", response.text)
+            # Tokens are printed as they arrive instead of after the whole reply
+            reply, timing = send_streaming(chat, user_query, prefix=" 🤖 : ")
+            print(f"    {timing.summary()}")
 
             # Add conversation to memory
             mem_client.add([
                 {"role":"user","content":user_query},
-                {"role":"assistant","content":response.text}
+                {"role":"assistant","content":reply}
             ], user_id="pravin007")
             
         except Exception as e:
@@ -0,0 +1,7 @@
+"""
+Helpers shared by the numbered chapters (token counting, embeddings, vector
+search, caching ...).
+
+The chapter folders are not packages, so scripts add the repo root to
+``sys.path`` before importing from here.
+"""
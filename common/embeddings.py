@@ -0,0 +1,241 @@
+"""
+One embedding layer for every chapter.
+
+``EmbeddingClient`` wraps any "list of texts -> list of vectors" provider call
+and adds three things on top of it:
+
+* identical texts are embedded once (within a call and across calls),
+* vectors are persisted in a SQLite cache keyed by (model, sha256(text)),
+  so re-indexing the same PDFs costs nothing,
+* concurrent single ``embed()`` calls are coalesced into provider-sized
+  batches by a background worker.
+
+``CachedEmbeddings`` exposes the same client as a LangChain ``Embeddings`` so
+it can be handed to ``QdrantVectorStore`` in place of the raw provider.
+"""
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Vectors on disk in SQLite, keyed by (model, sha256(text))."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, digest TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, digest))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, digests: list[str]) -> dict:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(digests), 500):
+                chunk = digests[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                    [model, *chunk],
+                )
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model: str, items: dict):
+        rows = [(model, digest, np.asarray(vector, dtype=np.float32).tobytes()) for digest, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class EmbeddingStats:
+    requested: int = 0
+    cache_hits: int = 0
+    duplicates: int = 0
+    embedded: int = 0
+    provider_calls: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class EmbeddingClient:
+    """Deduplicating, caching, batching front-end for an embedding provider."""
+
+    def __init__(self, embed_fn, model: str, batch_size: int = 100, cache: EmbeddingCache | None = None,
+                 max_workers: int = 4, max_wait: float = 0.01):
+        self.embed_fn = embed_fn
+        self.model = model
+        self.batch_size = batch_size
+        self.cache = cache
+        self.max_wait = max_wait
+        self.stats = EmbeddingStats()
+        self._stats_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    # ---------------------------- batch path ----------------------------
+
+    def embed_many(self, texts: list[str]) -> list[list[float]]:
+        """Embed ``texts`` (order preserved) paying only for unique, uncached ones."""
+        digests = [text_digest(text) for text in texts]
+        unique = dict(zip(digests, texts))
+        vectors = self.cache.get_many(self.model, list(unique)) if self.cache is not None else {}
+
+        missing = [digest for digest in unique if digest not in vectors]
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        fresh = {}
+        for batch, result in zip(batches, self._pool.map(self._call_provider, [[unique[d] for d in b] for b in batches])):
+            fresh.update(zip(batch, result))
+
+        if fresh and self.cache is not None:
+            self.cache.put_many(self.model, fresh)
+        vectors.update(fresh)
+
+        with self._stats_lock:
+            self.stats.requested += len(texts)
+            self.stats.duplicates += len(texts) - len(unique)
+            self.stats.cache_hits += len(unique) - len(missing)
+            self.stats.embedded += len(missing)
+            self.stats.provider_calls += len(batches)
+
+        return [vectors[digest] for digest in digests]
+
+    def _call_provider(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.embed_fn(texts)
+        if len(vectors) != len(texts):
+            raise ValueError(f"Provider returned {len(vectors)} vectors for {len(texts)} texts")
+        return [list(vector) for vector in vectors]
+
+    # --------------------------- coalesced path ---------------------------
+
+    def embed(self, text: str) -> list[float]:
+        """Embed one text; concurrent callers are merged into shared batches."""
+        return self.submit(text).result()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_worker, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _run_worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                vectors = self.embed_many([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+
+            if stop:
+                return
+
+    def close(self):
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        self._pool.shutdown()
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain ``Embeddings`` backed by ``EmbeddingClient``s.
+
+    Some providers embed queries differently from documents (Gemini uses a
+    separate task type), so queries may go through their own client.
+    """
+
+    def __init__(self, client: EmbeddingClient, query_client: EmbeddingClient | None = None):
+        self.client = client
+        self.query_client = query_client or client
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.client.embed_many(list(texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.query_client.embed(text)
+
+
+# ------------------------------ providers ------------------------------
+
+def openai_embed_fn(client, model: str = "text-embedding-3-small"):
+    """Batch embed function for an ``openai.OpenAI`` client."""
+    def embed(texts):
+        response = client.embeddings.create(model=model, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return embed
+
+
+def langchain_embed_fn(embeddings: Embeddings, query: bool = False):
+    """Batch embed function for any LangChain embeddings (e.g. ``GoogleGenerativeAIEmbeddings``)."""
+    if query:
+        return lambda texts: [embeddings.embed_query(text) for text in texts]
+    return embeddings.embed_documents
+
+
+def cached_langchain_embeddings(embeddings: Embeddings, model: str, cache_path, batch_size: int = 100) -> CachedEmbeddings:
+    """Wrap LangChain embeddings with dedup, batching and the on-disk cache."""
+    cache = EmbeddingCache(cache_path)
+    documents = EmbeddingClient(langchain_embed_fn(embeddings), model=model, batch_size=batch_size, cache=cache)
+    queries = EmbeddingClient(langchain_embed_fn(embeddings, query=True), model=f"{model}#query",
+                              batch_size=batch_size, cache=cache)
+    return CachedEmbeddings(documents, queries)
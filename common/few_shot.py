@@ -0,0 +1,109 @@
+"""
+Dynamic few-shot example selection.
+
+Pasting every example into the prompt makes each request pay for all of them,
+and the bill grows with the example library. ``FewShotStore`` embeds each
+example's input once (through the on-disk embedding cache, so a restart costs
+one SQLite read), keeps the vectors as one normalized matrix and, per request,
+picks the examples most similar to the user's message that fit a token
+budget. The prompt then grows with ``k`` instead of with the library.
+
+Examples are JSONL, one per line::
+
+    {"input": "How to write a function in python", "output": "def fn_name(x: int) -> int: ..."}
+    {"input": "What is 2 + 2", "output": [{"step": "analyse", "content": "..."}, ...]}
+
+A list ``output`` is a multi-turn answer (one model turn per item); dict
+items are sent as JSON.
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from common.tokens import DEFAULT_MODEL, TokenCounter
+
+
+@dataclass(frozen=True)
+class FewShotExample:
+    input: str
+    outputs: tuple          # model turns, already as text
+    tokens: int = 0         # cost of the example as rendered by ``as_text``
+
+    def as_text(self, user_label: str = "User", model_label: str = "MODEL") -> str:
+        """The example as a block of a system prompt."""
+        return "\n".join([f"{user_label} : {self.input}"] + [f"{model_label} : {output}" for output in self.outputs])
+
+    def as_history(self) -> list[dict]:
+        """The example as chat turns: the user's message, then each model turn."""
+        return [{"role": "user", "parts": [self.input]}] + [{"role": "model", "parts": [output]}
+                                                            for output in self.outputs]
+
+
+@dataclass
+class Selection:
+    examples: list          # most similar last, so the closest example sits next to the question
+    tokens: int
+    library_tokens: int     # what pasting the whole library would have cost
+    library_size: int
+
+    def summary(self) -> str:
+        return (f"🧩 {len(self.examples)} of {self.library_size} examples · "
+                f"{self.tokens} of {self.library_tokens} example tokens")
+
+
+def load_examples(path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _output_turns(output) -> tuple:
+    turns = output if isinstance(output, list) else [output]
+    return tuple(turn if isinstance(turn, str) else json.dumps(turn) for turn in turns)
+
+
+class FewShotStore:
+
+    def __init__(self, records, embeddings: Embeddings, token_model: str = DEFAULT_MODEL):
+        counter = TokenCounter(token_model)
+        drafts = [FewShotExample(input=record["input"], outputs=_output_turns(record["output"]))
+                  for record in records]
+        costs = counter.count_batch([draft.as_text() for draft in drafts]) if drafts else []
+        self.examples = [FewShotExample(draft.input, draft.outputs, cost) for draft, cost in zip(drafts, costs)]
+        self.embeddings = embeddings
+        self.library_tokens = sum(costs)
+
+        vectors = np.asarray(embeddings.embed_documents([example.input for example in self.examples]),
+                             dtype=np.float32).reshape(len(self.examples), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self._matrix = vectors / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def from_jsonl(cls, path, embeddings: Embeddings, **kwargs) -> "FewShotStore":
+        return cls(load_examples(Path(path)), embeddings, **kwargs)
+
+    def __len__(self):
+        return len(self.examples)
+
+    def select(self, query: str, k: int = 3, token_budget: int = 400) -> Selection:
+        """Up to ``k`` examples closest to ``query`` whose combined cost stays within ``token_budget``.
+
+        Candidates are taken in order of similarity; one that would overflow the
+        budget is skipped in favour of a cheaper, less similar one.
+        """
+        chosen, spent = [], 0
+        if self.examples and k > 0:
+            query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            scores = self._matrix @ query_vector
+            for row in np.argsort(-scores, kind="stable"):
+                example = self.examples[row]
+                if spent + example.tokens > token_budget:
+                    continue
+                chosen.append(example)
+                spent += example.tokens
+                if len(chosen) == k:
+                    break
+        return Selection(examples=chosen[::-1], tokens=spent, library_tokens=self.library_tokens,
+                         library_size=len(self.examples))
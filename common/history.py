@@ -0,0 +1,102 @@
+"""
+Chat history that always knows its own size in tokens.
+
+Every message is counted once: counts are memoized by a hash of the message
+content, so repeated prompts such as "Continue to the next step." are never
+re-encoded, and the history keeps a running total so a budget check before a
+``send_message`` is O(1) instead of re-encoding the whole conversation.
+"""
+import hashlib
+from collections import OrderedDict
+
+from common.tokens import DEFAULT_MODEL, count_tokens
+
+MAX_CACHED_MESSAGES = 50_000
+
+_token_cache: OrderedDict = OrderedDict()
+
+
+def message_text(message) -> str:
+    """Text of a Gemini ``{"role", "parts"}`` dict, an OpenAI-style dict or a LangChain message."""
+    if isinstance(message, str):
+        return message
+    if isinstance(message, dict):
+        if "parts" in message:
+            return "".join(part if isinstance(part, str) else str(part) for part in message["parts"])
+        content = message.get("content", "")
+    else:
+        content = getattr(message, "content", "")
+    if isinstance(content, list):
+        return "".join(item if isinstance(item, str) else str(item.get("text", "")) for item in content)
+    return str(content)
+
+
+def cached_token_count(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Token count of ``text``, memoized by (model, sha1(text))."""
+    key = (model, hashlib.sha1(text.encode("utf-8")).hexdigest())
+    count = _token_cache.get(key)
+    if count is not None:
+        _token_cache.move_to_end(key)
+        return count
+
+    count = count_tokens(text, model)
+    _token_cache[key] = count
+    if len(_token_cache) > MAX_CACHED_MESSAGES:
+        _token_cache.popitem(last=False)
+    return count
+
+
+def count_messages(messages, model: str = DEFAULT_MODEL) -> int:
+    """Total tokens of a message list (e.g. LangGraph ``State["messages"]``)."""
+    return sum(cached_token_count(message_text(message), model) for message in messages)
+
+
+class ChatHistory:
+    """A list of Gemini chat messages with per-message token counts and a running total."""
+
+    def __init__(self, messages=None, model: str = DEFAULT_MODEL):
+        self.model = model
+        self.messages = []
+        self._counts = []
+        self.total_tokens = 0
+        for message in messages or []:
+            self.add(message)
+
+    def add(self, message: dict) -> int:
+        """Append an already formatted message and return its token count."""
+        count = cached_token_count(message_text(message), self.model)
+        self.messages.append(message)
+        self._counts.append(count)
+        self.total_tokens += count
+        return count
+
+    def append(self, role: str, content: str) -> int:
+        return self.add({"role": role, "parts": [content]})
+
+    def pop_oldest(self) -> dict:
+        self.total_tokens -= self._counts.pop(0)
+        return self.messages.pop(0)
+
+    def fits(self, budget: int, extra: str = "") -> bool:
+        """True if the history plus ``extra`` stays within ``budget`` tokens."""
+        extra_tokens = cached_token_count(extra, self.model) if extra else 0
+        return self.total_tokens + extra_tokens <= budget
+
+    def trim_to(self, budget: int) -> list:
+        """Drop the oldest messages until the history fits ``budget``; return what was dropped."""
+        dropped = []
+        while self.messages and self.total_tokens > budget:
+            dropped.append(self.pop_oldest())
+        return dropped
+
+    def token_counts(self) -> list:
+        return list(self._counts)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
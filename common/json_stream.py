@@ -0,0 +1,247 @@
+"""
+Incremental JSON parsing of streamed step replies.
+
+The agents used to wait for the whole reply and then ``json.loads`` it.
+``JsonStreamParser`` consumes the stream chunk by chunk instead and reports
+
+* a tracked top-level field (``step``, ``tool``, ``function``, ``input`` by
+  default) the moment its value closes, and
+* each complete top-level object, so a reply holding several objects
+  (newline-delimited or back to back) yields them one by one.
+
+Only the new characters of each chunk are scanned, jumping between structural
+characters (and, inside strings, between quotes and backslashes) with a regex
+rather than walking every character. The text of the object in progress is
+kept as a list of chunk slices and joined once, when the object closes, so
+no chunk copies the buffer. Text outside objects (code fences, stray prose) is
+skipped.
+
+``EarlyToolCall`` builds on the field events: an ``action`` step's tool is
+started as soon as its name and input have closed, while the model is still
+writing the rest of the object. Only tools without side effects are started
+this way, since the reply may still turn out to be broken.
+"""
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from common.streaming import chunk_text
+
+STEP_FIELDS = ("step", "tool", "function", "input")
+
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+_STRING_BREAK = re.compile(r'["\\]')
+
+# Tools started early run here, so several agents (or turns) can share the threads
+_tool_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool")
+
+
+class StreamEvent(NamedTuple):
+    kind: str       # "field" or "object"
+    key: str | None
+    value: object
+
+
+class JsonStreamParser:
+
+    def __init__(self, fields=STEP_FIELDS):
+        self.fields = frozenset(fields)
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object = []           # slices of the object in progress
+        self._key_parts = None      # slices of a top-level key being read
+        self._key = None
+        self._expect_key = False
+        self._value_state = None    # None | "pending" | "string" | "container"
+        self._capture = None        # slices of a tracked value being read
+
+    def feed(self, text: str) -> list[StreamEvent]:
+        """Scan one chunk; returns the fields and objects it completed."""
+        events = []
+        i, n = 0, len(text)
+        object_start = 0 if self._depth else None
+        capture_start = 0 if self._capture is not None else None
+        key_start = 0 if self._key_parts is not None else None
+
+        while i < n:
+            if self._depth == 0:
+                i = text.find("{", i)
+                if i == -1:
+                    break
+                object_start = i
+                self._depth, self._expect_key = 1, True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_BREAK.search(text, i)
+                if match is None:
+                    break
+                i = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                    continue
+                self._in_string = False
+                if key_start is not None:
+                    self._key_parts.append(text[key_start:i - 1])
+                    self._key = json.loads('"' + "".join(self._key_parts) + '"')
+                    self._key_parts = key_start = None
+                elif self._depth == 1 and self._value_state == "string":
+                    events += self._close_value(text, capture_start, i)
+                    capture_start = None
+                continue
+
+            match = _STRUCTURAL.search(text, i)
+            if match is None:
+                break
+            i, char = match.start(), match.group()
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._expect_key = False
+                    self._key_parts, key_start = [], i + 1
+                elif self._depth == 1 and self._value_state == "pending":
+                    self._value_state = "string"
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and self._value_state == "pending":
+                    self._value_state = "container"
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._value_state == "pending":
+                        events += self._close_value(text, capture_start, i)
+                        capture_start = None
+                    self._object.append(text[object_start:i + 1])
+                    raw, self._object, object_start = "".join(self._object), [], None
+                    self._reset_value()
+                    events.append(StreamEvent("object", None, json.loads(raw)))
+                elif self._depth == 1 and self._value_state == "container":
+                    events += self._close_value(text, capture_start, i + 1)
+                    capture_start = None
+            elif char == "," and self._depth == 1:
+                if self._value_state == "pending":
+                    events += self._close_value(text, capture_start, i)
+                    capture_start = None
+                self._expect_key = True
+            elif char == ":" and self._depth == 1:
+                self._value_state = "pending"
+                if self._key in self.fields:
+                    self._capture, capture_start = [], i + 1
+            i += 1
+
+        if object_start is not None and self._depth:
+            self._object.append(text[object_start:])
+        if capture_start is not None:
+            self._capture.append(text[capture_start:])
+        if key_start is not None:
+            self._key_parts.append(text[key_start:])
+        return events
+
+    def _close_value(self, text: str, start, end: int) -> list[StreamEvent]:
+        events = []
+        if self._capture is not None:
+            raw = "".join(self._capture) + text[start:end]
+            events.append(StreamEvent("field", self._key, json.loads(raw)))
+        self._reset_value()
+        return events
+
+    def _reset_value(self):
+        self._key = self._capture = self._value_state = None
+
+    def close(self):
+        """End of stream; raises ValueError if it stopped inside an object."""
+        if self._depth:
+            raise ValueError("Stream ended inside a JSON object.")
+
+
+def iter_objects(response, fields=()):
+    """Top-level objects of a streamed reply, each as soon as it closes."""
+    parser = JsonStreamParser(fields)
+    for chunk in response:
+        for event in parser.feed(chunk_text(chunk)):
+            if event.kind == "object":
+                yield event.value
+    parser.close()
+
+
+@dataclass
+class StepReply:
+    step: dict | None           # the first complete object, None if none closed
+    fields: dict = field(default_factory=dict)   # tracked fields that closed, even in a broken object
+    text: str = ""
+    error: str | None = None
+
+
+def read_step(response, on_field=None, fields=STEP_FIELDS) -> StepReply:
+    """Read one streamed step reply to the end.
+
+    ``on_field(fields_so_far)`` is called whenever a tracked field closes. The
+    stream is always drained, so a chat session's history is complete even
+    when the JSON is broken.
+    """
+    parser = JsonStreamParser(fields)
+    reply, pieces = StepReply(step=None), []
+    for chunk in response:
+        text = chunk_text(chunk)
+        pieces.append(text)
+        if reply.error is not None:
+            continue
+        try:
+            events = parser.feed(text)
+        except ValueError as e:
+            reply.error = str(e)
+            continue
+        for event in events:
+            if event.kind == "field" and reply.step is None:
+                reply.fields[event.key] = event.value
+                if on_field is not None:
+                    on_field(reply.fields)
+            elif event.kind == "object" and reply.step is None:
+                reply.step = event.value
+    reply.text = "".join(pieces)
+    if reply.step is None and reply.error is None:
+        reply.error = "No complete JSON object in the reply."
+    return reply
+
+
+class EarlyToolCall:
+    """Starts an ``action`` step's tool as soon as its name and input have streamed in.
+
+    Pass it as ``read_step``'s ``on_field``; ``result`` then waits for the call
+    that already started, or makes the call now if it never did. A call
+    started early runs before the reply is known to be valid, so only the
+    side-effect-free tools named in ``early`` (e.g. lookups) are started that
+    way; the rest run when ``result`` is asked for. Use a new instance per reply.
+    """
+
+    def __init__(self, tools: dict, name_field: str = "tool", early=()):
+        self.tools = tools
+        self.name_field = name_field
+        self.early = set(early)
+        self._started = None
+
+    def __call__(self, fields: dict):
+        if self._started is not None or fields.get("step") != "action" or "input" not in fields:
+            return
+        name = fields.get(self.name_field)
+        if name in self.tools and name in self.early:
+            self._started = (name, fields["input"], _tool_pool.submit(self.tools[name], fields["input"]))
+
+    @property
+    def started(self) -> bool:
+        return self._started is not None
+
+    def result(self, name: str, tool_input):
+        if self._started is not None:
+            started_name, started_input, future = self._started
+            if started_name == name and started_input == tool_input:
+                return future.result()
+        return self.tools[name](tool_input)
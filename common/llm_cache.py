@@ -0,0 +1,352 @@
+"""
+Exact-match cache of model responses, keyed by the full request.
+
+CI and evaluation runs send the same requests over and over: the same model,
+system instruction, generation config, history and message. With
+``LLM_CACHE=1``, ``get_generative_model`` wraps the model in
+``CachedGenerativeModel``. A request seen before is then answered from the
+cache instead of the API. The key is the SHA-256 of a canonical JSON form of
+everything that shapes the reply: the model's constructor arguments, the
+contents (or the chat history plus the new message) and any per-call
+settings. Dict keys are sorted, pydantic schemas become their JSON schema and
+SDK ``Content`` objects become plain role/parts dicts, so equal requests hash
+equal however they were built.
+
+Responses live in SQLite, so the cache survives restarts and is shared across
+scripts. Recently used entries are also kept in memory, so a hit costs a hash
+and a dict lookup. The store is bounded by bytes, evicting the least recently
+used entries first. Pass ``cache=False`` to ``generate_content`` or
+``send_message`` to bypass the cache for one call. Streamed calls work too: a
+hit replays the cached text as one chunk, a miss is recorded once the stream
+has been read to the end.
+
+Environment knobs (all optional)::
+
+    LLM_CACHE             1 = cache generative model calls (0)
+    LLM_CACHE_PATH        SQLite file (.cache/llm-responses.sqlite at the repo root)
+    LLM_CACHE_MAX_MB      size bound of the stored responses (256)
+"""
+import atexit
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from common.streaming import chunk_text
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "llm-responses.sqlite"
+
+# Call arguments that change how a reply is delivered, not what it says
+_DELIVERY_ARGS = {"stream", "request_options"}
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def llm_cache_enabled() -> bool:
+    return os.getenv("LLM_CACHE", "0") not in ("", "0")
+
+
+# ------------------------------ request keys ------------------------------
+
+def canonical(value):
+    """A JSON-serializable form of a request argument that is equal for equal requests."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if inspect.isclass(value) and hasattr(value, "model_json_schema"):
+        return {"schema": value.model_json_schema()}
+    if hasattr(value, "role") and hasattr(value, "parts"):
+        # google.generativeai Content (e.g. a ChatSession's history)
+        return {"role": value.role, "parts": [canonical(part) for part in value.parts]}
+    if hasattr(value, "text") and isinstance(getattr(value, "text"), str):
+        return value.text
+    if callable(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', repr(value))}"
+    if hasattr(type(value), "to_dict"):
+        return canonical(type(value).to_dict(value))
+    return repr(value)
+
+
+def canonical_json(value) -> str:
+    return json.dumps(canonical(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def request_key(model_json: str, **request) -> str:
+    """Hash of a request; ``model_json`` is the model's ``canonical_json``, computed once per model."""
+    text = model_json + "\n" + canonical_json(request)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ------------------------------ store ------------------------------
+
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    evicted: int = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class ResponseCache:
+    """Response texts in SQLite keyed by request hash, with an in-memory LRU in front."""
+
+    def __init__(self, path, max_bytes: int = 256 * 1024 * 1024, memory_entries: int = 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.stats = ResponseCacheStats()
+        self._memory = OrderedDict()
+        self._touched = {}          # key -> last use, written back in batches instead of on every hit
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            text = self._memory.get(key)
+            if text is None:
+                row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.stats.misses += 1
+                    return None
+                text = row[0]
+                self._remember(key, text)
+            else:
+                self._memory.move_to_end(key)
+            self._touched[key] = time.time()
+            if len(self._touched) >= 256:
+                self._flush_touched()
+                self._conn.commit()
+            self.stats.hits += 1
+            return text
+
+    def put(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, text, size, time.time()))
+            self._bytes += size - (old[0] if old else 0)
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self._remember(key, text)
+            self._evict()
+            self._conn.commit()
+
+    def _remember(self, key: str, text: str):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if self._bytes <= self.max_bytes:
+                break
+            doomed.append(key)
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in doomed])
+        for key in doomed:
+            self._memory.pop(key, None)
+        self.stats.evicted += len(doomed)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+def get_response_cache(path=None) -> ResponseCache:
+    """The process-wide cache for ``path`` (``LLM_CACHE_PATH`` by default), shared by every wrapped model."""
+    path = Path(path or os.getenv("LLM_CACHE_PATH") or DEFAULT_PATH)
+    with _caches_lock:
+        if path not in _caches:
+            max_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB") or 256) * 1024 * 1024)
+            _caches[path] = ResponseCache(path, max_bytes=max_bytes)
+            # Hits only record their use in memory; write it back so eviction order survives the run
+            atexit.register(_caches[path].close)
+        return _caches[path]
+
+
+# ------------------------------ model wrappers ------------------------------
+
+class CachedChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class CachedResponse:
+    """A response served from the cache: ``.text`` when blocking, one chunk when streamed."""
+
+    cached = True
+    usage_metadata = None
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __iter__(self):
+        yield CachedChunk(self.text)
+
+    def resolve(self):
+        pass
+
+
+class RecordingStream:
+    """Passes a streamed response through and stores its text once it has been read to the end."""
+
+    def __init__(self, response, on_complete):
+        self._response = response
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        parts = []
+        for chunk in self._response:
+            parts.append(chunk_text(chunk))
+            yield chunk
+        self._on_complete("".join(parts))
+
+    def resolve(self):
+        for _ in self:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def _call_settings(kwargs: dict) -> dict:
+    return {name: value for name, value in kwargs.items() if name not in _DELIVERY_ARGS}
+
+
+class CachedGenerativeModel:
+    """Wraps a ``genai.GenerativeModel`` (or the fake); ``model_args`` are its constructor arguments."""
+
+    def __init__(self, model, model_args: dict, cache: ResponseCache, provider: str):
+        self.model = model
+        self.model_args = model_args
+        self.cache = cache
+        self.provider = provider
+        # Schemas and system prompts are the same on every call: serialize them once
+        self._model_json = canonical_json({"provider": provider, "model": model_args})
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def key(self, contents, kwargs: dict) -> str:
+        return request_key(self._model_json, contents=contents, settings=_call_settings(kwargs))
+
+    def serve(self, key: str | None, call, stream: bool, on_hit=None):
+        """Cached response for ``key``, or ``call()``'s response, stored once its text is known."""
+        if key is None:
+            self.cache.stats.bypassed += 1
+            return call()
+        text = self.cache.get(key)
+        if text is not None:
+            if on_hit is not None:
+                on_hit(text)
+            return CachedResponse(text)
+        response = call()
+        if stream:
+            return RecordingStream(response, lambda text: self.cache.put(key, text))
+        self._store(key, response)
+        return response
+
+    def _store(self, key: str, response):
+        try:
+            text = response.text
+        except ValueError:
+            # Blocked or empty replies have no text; don't cache them
+            return
+        self.cache.put(key, text)
+
+    def generate_content(self, contents, stream: bool = False, cache: bool = True, **kwargs):
+        key = self.key(contents, kwargs) if cache else None
+        return self.serve(key, lambda: self.model.generate_content(contents, stream=stream, **kwargs), stream)
+
+    async def generate_content_async(self, contents, cache: bool = True, **kwargs):
+        if not cache or kwargs.get("stream"):
+            self.cache.stats.bypassed += 1
+            return await self.model.generate_content_async(contents, **kwargs)
+        key = self.key(contents, kwargs)
+        text = self.cache.get(key)
+        if text is not None:
+            return CachedResponse(text)
+        response = await self.model.generate_content_async(contents, **kwargs)
+        self._store(key, response)
+        return response
+
+    def start_chat(self, history=None, **kwargs):
+        return CachedChatSession(self, self.model.start_chat(history=history, **kwargs))
+
+
+class CachedChatSession:
+    """Chat session whose turns are keyed by the whole history plus the new message.
+
+    On a hit the cached turn is appended to the wrapped session's history, so
+    later (uncached) turns still send the full conversation.
+    """
+
+    def __init__(self, model: CachedGenerativeModel, session):
+        self.model = model
+        self.session = session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    @property
+    def history(self):
+        return self.session.history
+
+    @history.setter
+    def history(self, history):
+        self.session.history = history
+
+    def send_message(self, content, stream: bool = False, cache: bool = True, **kwargs):
+        key = self.model.key({"history": self.session.history, "message": content}, kwargs) if cache else None
+        return self.model.serve(key, lambda: self.session.send_message(content, stream=stream, **kwargs), stream,
+                                on_hit=lambda text: self._append_turn(content, text))
+
+    def _append_turn(self, content, text: str):
+        parts = list(content) if isinstance(content, (list, tuple)) else [content]
+        self.session.history = [*self.session.history, {"role": "user", "parts": parts},
+                                {"role": "model", "parts": [text]}]
@@ -0,0 +1,155 @@
+"""
+LangChain ``VectorStore`` on top of ``MmapVectorIndex``.
+
+A drop-in, server-less stand-in for ``QdrantVectorStore``: payloads use the
+same ``{"page_content", "metadata"}`` shape, ``filter`` is a dict of metadata
+key -> value, and ``add_embeddings`` lets mem0's "langchain" vector store
+provider write pre-computed vectors into it.
+
+A filter value may also be a list (any of) or a ``{"gte": .., "lte": ..}``
+range. Keys with a payload index are answered from the index; the others fall
+back to checking every payload.
+"""
+import operator
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from common.vector_index import MmapVectorIndex
+
+
+def use_local_store() -> bool:
+    """``VECTOR_STORE=local`` selects this backend instead of the Qdrant server."""
+    return os.getenv("VECTOR_STORE", "qdrant").lower() == "local"
+
+
+def local_index_dir(collection_name: str, base=None) -> Path:
+    base = base or os.getenv("LOCAL_INDEX_DIR") or Path.cwd() / ".index"
+    return Path(base) / collection_name
+
+
+RANGE_OPERATORS = {"gte": operator.ge, "gt": operator.gt, "lte": operator.le, "lt": operator.lt}
+
+
+def _condition_matches(value, condition) -> bool:
+    if isinstance(condition, dict):
+        return isinstance(value, (int, float)) and all(
+            RANGE_OPERATORS[op](value, bound) for op, bound in condition.items()
+        )
+    if isinstance(condition, (list, tuple, set)):
+        return value in condition
+    return value == condition
+
+
+def metadata_matches(metadata: dict, filter: dict) -> bool:
+    return all(_condition_matches(metadata.get(key), condition) for key, condition in filter.items())
+
+
+class LocalVectorStore(VectorStore):
+
+    def __init__(self, path, embedding: Embeddings | None, dim: int | None = None, dtype: str = "float32",
+                 quantization: str | None = None, oversampling: float = 4.0, payload_indexes: dict | None = None):
+        self.path = Path(path)
+        self._embedding = embedding
+        # payload_indexes: {"metadata.source": "keyword", ...}, declared when the collection is created
+        self._index_options = {"dtype": dtype, "quantization": quantization, "oversampling": oversampling,
+                               "payload_indexes": payload_indexes}
+        self.index = None
+        self._open_lock = threading.Lock()
+        if dim or (self.path / "index.json").exists():
+            self.index = MmapVectorIndex(self.path, dim=dim, **self._index_options)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _index_for(self, dim: int) -> MmapVectorIndex:
+        with self._open_lock:
+            if self.index is None:
+                self.index = MmapVectorIndex(self.path, dim=dim, **self._index_options)
+        return self.index
+
+    # ------------------------------ writes ------------------------------
+
+    def add_embeddings(self, text_embeddings, metadatas: list | None = None, ids: list | None = None, **kwargs) -> list:
+        text_embeddings = list(text_embeddings)
+        if not text_embeddings:
+            return []
+        texts = [text for text, _ in text_embeddings]
+        vectors = np.asarray([vector for _, vector in text_embeddings], dtype=np.float32)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [str(id_) for id_ in ids] if ids else [uuid.uuid4().hex for _ in texts]
+
+        payloads = [{"page_content": text, "metadata": metadata or {}} for text, metadata in zip(texts, metadatas)]
+        self._index_for(vectors.shape[1]).add(ids, vectors, payloads)
+        return ids
+
+    def add_texts(self, texts, metadatas: list | None = None, ids: list | None = None, **kwargs) -> list:
+        texts = list(texts)
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: list | None = None, **kwargs) -> bool:
+        if self.index is None or not ids:
+            return False
+        return self.index.delete([str(id_) for id_ in ids]) > 0
+
+    # ------------------------------ reads ------------------------------
+
+    def get_by_ids(self, ids) -> list[Document]:
+        if self.index is None:
+            return []
+        return [self._to_document(id_, payload) for id_, payload in self.index.get([str(id_) for id_ in ids])]
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, filter: dict | None = None, **kwargs) -> list:
+        if self.index is None:
+            return []
+        mask = self._filter_mask(filter) if filter else None
+        return [(self._to_document(id_, payload), score) for id_, score, payload in self.index.search(embedding, k, mask=mask)]
+
+    def _filter_mask(self, filter: dict):
+        mask = self.index.filter_mask({f"metadata.{key}": condition for key, condition in filter.items()})
+        if mask is None:
+            # Some key isn't indexed: check every payload
+            mask = self.index.payload_mask(lambda payload: metadata_matches(payload["metadata"], filter))
+        return mask
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict | None = None, **kwargs) -> list:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: dict | None = None, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict | None = None, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2
+
+    @staticmethod
+    def _to_document(id_, payload) -> Document:
+        return Document(id=id_, page_content=payload["page_content"], metadata=payload["metadata"])
+
+    # --------------------------- constructors ---------------------------
+
+    @classmethod
+    def from_texts(cls, texts, embedding: Embeddings, metadatas: list | None = None, ids: list | None = None,
+                   collection_name: str = "learning_vectors", path=None, dtype: str = "float32",
+                   quantization: str | None = None, **kwargs):
+        store = cls(path or local_index_dir(collection_name), embedding, dtype=dtype, quantization=quantization)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    @classmethod
+    def from_existing_collection(cls, embedding: Embeddings, collection_name: str = "learning_vectors", path=None,
+                                 oversampling: float = 4.0, **kwargs):
+        path = Path(path or local_index_dir(collection_name))
+        if not (path / "index.json").exists():
+            raise ValueError(f"Local collection not found at {path}. Run the indexer first.")
+        return cls(path, embedding, oversampling=oversampling)
@@ -0,0 +1,341 @@
+"""
+Pluggable model providers, so every pipeline can run offline.
+
+``LLM_PROVIDER=fake`` and ``EMBEDDING_PROVIDER=fake`` swap the Gemini/OpenAI
+clients for deterministic local fakes with configurable latency and
+throughput. That lets the RAG ingest, the chat loops, the LangGraph graphs and
+mem0 run (and be benchmarked) without network, measuring only our own
+overhead.
+
+Environment knobs (all optional)::
+
+    FAKE_EMBEDDING_DIM            vector size of the hashing embedder (768)
+    FAKE_EMBEDDING_LATENCY_MS     fixed delay per embedding call (0)
+    FAKE_EMBEDDING_TEXTS_PER_SEC  throughput cap, 0 = unlimited (0)
+    FAKE_LLM_LATENCY_MS           time to first token (0)
+    FAKE_LLM_TOKENS_PER_SEC       generation speed, 0 = unlimited (0)
+    FAKE_LLM_REPLY_TOKENS         length of templated replies (32)
+    FAKE_LLM_SCRIPT               JSONL file of replies played back in order; for LangChain
+                                  models a {"tool_calls": [{"name", "args"}]} line calls tools
+    FAKE_LLM_THROTTLE_RATE        fraction of calls failing with a 429, to exercise retries (0)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from itertools import cycle
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Step names of the agent protocols in this repo, in the order they are emitted.
+# A templated reply walks the steps its system prompt mentions ("action" needs a
+# real tool name, so it is only produced by a FAKE_LLM_SCRIPT).
+STEP_ORDER = ["analyse", "plan", "think", "observe", "output", "validate", "complete", "result"]
+
+# Prompts containing this ask for all steps at once, as newline-delimited JSON
+NDJSON_MARKER = "newline-delimited JSON"
+
+# JSON replies for prompts that are not a step protocol (e.g. mem0's extraction prompts)
+JSON_TEMPLATES = [
+    ('"facts"', {"facts": []}),
+    ('"memory"', {"memory": []}),
+]
+
+_WORD = re.compile(r"\w+")
+
+# Scripts are shared by every model instance, so graphs that build a model per node keep advancing
+_scripts = {}
+
+
+def _env_float(name: str, default: float = 0.0) -> float:
+    return float(os.getenv(name) or default)
+
+
+def use_fake_llm() -> bool:
+    return os.getenv("LLM_PROVIDER", "").lower() == "fake"
+
+
+def use_fake_embeddings() -> bool:
+    return os.getenv("EMBEDDING_PROVIDER", "").lower() == "fake"
+
+
+# ------------------------------ embeddings ------------------------------
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic feature-hashing embedder: similar texts get similar vectors."""
+
+    def __init__(self, dim: int | None = None, latency_ms: float | None = None, texts_per_sec: float | None = None):
+        self.dim = dim or int(_env_float("FAKE_EMBEDDING_DIM", 768))
+        self.latency = (latency_ms if latency_ms is not None else _env_float("FAKE_EMBEDDING_LATENCY_MS")) / 1000
+        self.texts_per_sec = texts_per_sec if texts_per_sec is not None else _env_float("FAKE_EMBEDDING_TEXTS_PER_SEC")
+
+    def _vector(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if value & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _wait(self, count: int):
+        delay = self.latency + (count / self.texts_per_sec if self.texts_per_sec else 0)
+        if delay:
+            time.sleep(delay)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self._wait(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self._wait(1)
+        return self._vector(text)
+
+
+def embedding_cache_key(model: str) -> str:
+    """Name to cache vectors under, so fake vectors never mix with real ones."""
+    return f"fake-hashing:{model}" if use_fake_embeddings() else model
+
+
+def get_embeddings(model: str = "models/embedding-001", api_key: str | None = None) -> Embeddings:
+    """LangChain embeddings for ``EMBEDDING_PROVIDER`` (Gemini unless set to ``fake``).
+
+    Gemini reads ``GOOGLE_API_KEY`` unless ``api_key`` is given (e.g. the script's ``GEMINI_API_KEY``).
+    """
+    if use_fake_embeddings():
+        return HashingEmbeddings()
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    if api_key:
+        return GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key)
+    return GoogleGenerativeAIEmbeddings(model=model)
+
+
+# ------------------------------ generative model ------------------------------
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeResponse:
+    """Mimics a Gemini response: ``.text`` when blocking, iterable of chunks when streaming."""
+
+    def __init__(self, text: str, latency: float, tokens_per_sec: float, stream: bool):
+        self.text = text
+        self._pieces = re.findall(r"\S+\s*|\s+", text) or [""]
+        self._latency = latency
+        self._tokens_per_sec = tokens_per_sec
+        self._consumed = not stream
+        if not stream:
+            time.sleep(latency + (len(self._pieces) / tokens_per_sec if tokens_per_sec else 0))
+
+    def __iter__(self):
+        if self._consumed:
+            yield FakeChunk(self.text)
+            return
+        time.sleep(self._latency)
+        for piece in self._pieces:
+            if self._tokens_per_sec:
+                time.sleep(1 / self._tokens_per_sec)
+            yield FakeChunk(piece)
+        self._consumed = True
+
+    def resolve(self):
+        for _ in self:
+            pass
+
+
+class FakeGenerativeModel:
+    """Drop-in for ``genai.GenerativeModel`` that answers from a script or a template."""
+
+    def __init__(self, model_name: str = "fake", system_instruction: str | None = None,
+                 generation_config: dict | None = None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+        self.generation_config = generation_config or {}
+        self.latency = _env_float("FAKE_LLM_LATENCY_MS") / 1000
+        self.tokens_per_sec = _env_float("FAKE_LLM_TOKENS_PER_SEC")
+        self.reply_tokens = int(_env_float("FAKE_LLM_REPLY_TOKENS", 32))
+        self.throttle_rate = _env_float("FAKE_LLM_THROTTLE_RATE")
+        script = os.getenv("FAKE_LLM_SCRIPT")
+        if script and script not in _scripts:
+            _scripts[script] = cycle(self._load_script(script))
+        self._script = _scripts.get(script)
+        self.steps = [step for step in STEP_ORDER if f'"{step}"' in self.system_instruction]
+
+    @staticmethod
+    def _load_script(path) -> list[str]:
+        replies = []
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                reply = json.loads(line)
+                replies.append(reply if isinstance(reply, str) else json.dumps(reply))
+        return replies
+
+    def start_chat(self, history=None, **kwargs):
+        return FakeChatSession(self, history)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        return FakeChatSession(self).send_message(contents, stream=stream)
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.maybe_throttle()
+        text = self.reply(_message_text(contents), 0)
+        pieces = len(re.findall(r"\S+\s*|\s+", text)) or 1
+        await asyncio.sleep(self.latency + (pieces / self.tokens_per_sec if self.tokens_per_sec else 0))
+        return FakeResponse(text, 0, 0, stream=False)
+
+    def maybe_throttle(self):
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            from google.api_core.exceptions import ResourceExhausted
+
+            raise ResourceExhausted("Fake quota exceeded (FAKE_LLM_THROTTLE_RATE).")
+
+    def _filler(self, message: str) -> str:
+        words = _WORD.findall(message) or ["ok"]
+        return " ".join(words[i % len(words)] for i in range(self.reply_tokens))
+
+    def reply(self, message: str, turn: int) -> str:
+        if self._script is not None:
+            return next(self._script)
+
+        wants_json = self.generation_config.get("response_mime_type") == "application/json"
+        schema = self.generation_config.get("response_schema")
+        if schema is not None and hasattr(schema, "model_fields"):
+            return json.dumps({name: _schema_default(field.annotation) for name, field in schema.model_fields.items()})
+        if self.steps and not wants_json and NDJSON_MARKER in self.system_instruction:
+            # Streamed step protocol: every step in one reply, one JSON object per line
+            return "\n".join(json.dumps({"step": step, "content": f"[fake {step}] {self._filler(message)}"})
+                             for step in self.steps)
+        if wants_json and self.steps:
+            step = self.steps[turn % len(self.steps)]
+            return json.dumps({"step": step, "content": f"[fake {step}] {self._filler(message)}"})
+        if wants_json or "json" in self.system_instruction.lower():
+            for marker, payload in JSON_TEMPLATES:
+                if marker in self.system_instruction or marker in message:
+                    return json.dumps(payload)
+            if wants_json:
+                return json.dumps({"response": self._filler(message)})
+        return self._filler(message)
+
+
+def _schema_default(annotation):
+    return {bool: False, int: 0, float: 0.0}.get(annotation, "fake")
+
+
+def _message_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict):
+        return _message_text(content.get("parts") or content.get("content") or "")
+    if isinstance(content, (list, tuple)):
+        return " ".join(_message_text(part) for part in content)
+    return str(getattr(content, "text", content))
+
+
+class FakeChatSession:
+
+    def __init__(self, model: FakeGenerativeModel, history=None):
+        self.model = model
+        self.history = list(history or [])
+        self._turn = 0
+
+    def send_message(self, content, stream: bool = False, **kwargs):
+        self.model.maybe_throttle()
+        message = _message_text(content)
+        text = self.model.reply(message, self._turn)
+        self._turn += 1
+        if self.model.steps and self._turn % len(self.model.steps) == 0:
+            self._turn = 0
+        self.history.append({"role": "user", "parts": [message]})
+        self.history.append({"role": "model", "parts": [text]})
+        return FakeResponse(text, self.model.latency, self.model.tokens_per_sec, stream)
+
+
+def get_generative_model(cache: bool | None = None, **kwargs):
+    """``genai.GenerativeModel(**kwargs)``, or the fake when ``LLM_PROVIDER=fake``.
+
+    With ``LLM_CACHE=1`` (or ``cache=True``) the model answers repeated
+    requests from the response cache in ``common.llm_cache``.
+    """
+    if use_fake_llm():
+        model = FakeGenerativeModel(**kwargs)
+    else:
+        import google.generativeai as genai
+
+        model = genai.GenerativeModel(**kwargs)
+
+    from common.llm_cache import CachedGenerativeModel, get_response_cache, llm_cache_enabled
+
+    if not (llm_cache_enabled() if cache is None else cache):
+        return model
+    return CachedGenerativeModel(model, kwargs, get_response_cache(), provider="fake" if use_fake_llm() else "gemini")
+
+
+# ------------------------------ LangChain chat model ------------------------------
+
+class FakeChatModel(BaseChatModel):
+    """LangChain chat model answering with the same templates as ``FakeGenerativeModel``."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        system = "\n".join(_message_text(message.content) for message in messages if message.type == "system")
+        last = next((message for message in reversed(messages) if message.type == "human"), messages[-1])
+        model = FakeGenerativeModel(system_instruction=system)
+        text = model.reply(_message_text(last.content), 0)
+        FakeResponse(text, model.latency, model.tokens_per_sec, stream=False)
+        return ChatResult(generations=[ChatGeneration(message=_ai_message(text))])
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, **kwargs):
+        # Templated replies never call tools; a FAKE_LLM_SCRIPT line with "tool_calls" does
+        return self
+
+
+def _ai_message(text: str) -> AIMessage:
+    """``text`` as an AIMessage; a scripted ``{"content": ..., "tool_calls": [{"name", "args"}]}`` calls tools."""
+    try:
+        reply = json.loads(text)
+    except ValueError:
+        return AIMessage(content=text)
+    if not isinstance(reply, dict) or "tool_calls" not in reply:
+        return AIMessage(content=text)
+    tool_calls = [{"name": call["name"], "args": call.get("args", {}), "id": call.get("id") or f"fake-call-{index}"}
+                  for index, call in enumerate(reply["tool_calls"])]
+    return AIMessage(content=reply.get("content", ""), tool_calls=tool_calls)
+
+
+def get_chat_model(model: str, **kwargs):
+    """``init_chat_model(model)``, or a LangChain chat model backed by the fake."""
+    if use_fake_llm():
+        return FakeChatModel()
+    from langchain.chat_models import init_chat_model
+
+    return init_chat_model(model, **kwargs)
+
+
+# ------------------------------ mem0 ------------------------------
+
+def mem0_config(config: dict) -> dict:
+    """Point mem0's embedder / llm at the fakes when they are selected (the fake LLM runs without a graph store)."""
+    config = dict(config)
+    if use_fake_embeddings():
+        config["embedder"] = {"provider": "langchain", "config": {"model": HashingEmbeddings()}}
+    if use_fake_llm():
+        config["llm"] = {"provider": "langchain", "config": {"model": get_chat_model("fake")}}
+        # The graph store needs a Neo4j server and the LLM's entity-extraction tool calls
+        config.pop("graph_store", None)
+    return config
@@ -0,0 +1,125 @@
+"""
+Scalar (int8) and binary (1-bit) quantization for embedding search.
+
+Quantized codes are 4x (int8) or 32x (binary) smaller than float32 vectors.
+They are only used to shortlist candidates; the shortlist is then rescored
+against the original vectors, which stay on disk (memory-mapped) and are read
+for the candidate rows only.
+
+The ``qdrant_*`` helpers build the equivalent server-side settings for the
+Qdrant collection, where Qdrant keeps the codes in RAM and rescores itself.
+"""
+import numpy as np
+
+MODES = ("int8", "binary")
+SCORE_BLOCK_ROWS = 65_536
+
+_POPCOUNT_TABLE = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    # np.bitwise_count only exists on NumPy >= 2.0
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    return _POPCOUNT_TABLE[bits]
+
+
+def check_mode(mode: str | None) -> str | None:
+    mode = (mode or "").lower() or None
+    if mode in (None, "none", "float32"):
+        return None
+    if mode not in MODES:
+        raise ValueError(f"Unknown quantization {mode!r}; expected one of {MODES}")
+    return mode
+
+
+class ScalarQuantizer:
+    """Per-dimension symmetric int8 quantization, calibrated on the first vectors seen."""
+
+    code_dtype = np.int8
+
+    def __init__(self, scale: np.ndarray | None = None, quantile: float = 0.999):
+        self.scale = scale
+        self.quantile = quantile
+
+    def fit(self, vectors: np.ndarray):
+        bound = np.quantile(np.abs(vectors), self.quantile, axis=0) if len(vectors) > 1 else np.abs(vectors[0])
+        self.scale = (np.where(bound == 0, 1.0, bound) / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.scale is None:
+            self.fit(vectors)
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def code_width(self, dim: int) -> int:
+        return dim
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products: codes * scale . query, upcast block by block."""
+        scaled_query = (query * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        return out
+
+
+class BinaryQuantizer:
+    """Sign bits packed 8 per byte; similarity is the negated Hamming distance."""
+
+    code_dtype = np.uint8
+    scale = None
+
+    def fit(self, vectors: np.ndarray):
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > 0, axis=-1)
+
+    def code_width(self, dim: int) -> int:
+        return (dim + 7) // 8
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        query_code = self.encode(query.reshape(1, -1))[0]
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            out[start:start + len(block)] = -popcount(block ^ query_code).sum(axis=1, dtype=np.int32)
+        return out
+
+
+def make_quantizer(mode: str, scale: np.ndarray | None = None):
+    mode = check_mode(mode)
+    if mode == "int8":
+        return ScalarQuantizer(scale=scale)
+    if mode == "binary":
+        return BinaryQuantizer()
+    raise ValueError("Quantization mode is required")
+
+
+# ------------------------------ Qdrant settings ------------------------------
+
+def qdrant_quantization_config(mode: str | None):
+    """``quantization_config`` for ``create_collection`` (None keeps full precision)."""
+    from qdrant_client import models
+
+    mode = check_mode(mode)
+    if mode == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def qdrant_search_params(mode: str | None, oversampling: float = 4.0):
+    """Search params that shortlist on the quantized codes and rescore with the originals."""
+    from qdrant_client import models
+
+    if check_mode(mode) is None:
+        return None
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=oversampling)
+    )
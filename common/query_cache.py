@@ -0,0 +1,86 @@
+"""
+In-memory LRU + TTL cache in front of query embeddings.
+
+Chat users repeat themselves ("what is the event loop?", "What is the event
+loop"), and every retrieval turn would otherwise pay an embedding round-trip.
+Queries are keyed by a normalized form of their text - case, whitespace and
+punctuation removed - so retyped questions hit the same entry while any
+change of wording gets its own vector. Paraphrases are not matched: telling
+them apart from different questions would take the embedding being saved.
+Entries expire after ``ttl`` seconds so a long-running session doesn't hold
+on to vectors from a model that has since been swapped out.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from langchain_core.embeddings import Embeddings
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_query(text: str) -> str:
+    # Only case, whitespace and punctuation: dropping words ("not", "how", "why") would merge different questions
+    text = unicodedata.normalize("NFKC", text).lower().replace("'", "").replace("’", "")
+    return " ".join(_WORD.findall(text))
+
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class QueryEmbeddingCache(Embeddings):
+    """Wraps any LangChain ``Embeddings``; only ``embed_query`` is cached."""
+
+    def __init__(self, embeddings: Embeddings, maxsize: int = 1024, ttl: float = 3600.0):
+        self.embeddings = embeddings
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = QueryCacheStats()
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = normalize_query(text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, vector = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return vector
+                del self._entries[key]
+                self.stats.expired += 1
+            self.stats.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
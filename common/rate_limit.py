@@ -0,0 +1,120 @@
+"""
+Client-side rate limiting and retries for asyncio model calls.
+
+``RateLimiter`` keeps one token bucket for requests per minute and one for
+tokens per minute, the two quotas Gemini (and most providers) enforce. A call
+reserves one request and its estimated tokens before it is sent. Once the
+reply's real usage is known, ``settle`` charges or refunds the difference.
+The buckets are served in arrival order, so a large prompt is not starved by
+small ones.
+
+``with_retries`` re-runs a call that failed with a throttling or transient
+server error. It waits an exponential backoff with full jitter between
+attempts, so the retries of many concurrent calls don't land together.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+
+class TokenBucket:
+    """``rate_per_minute`` units refilled continuously, holding at most ``capacity``."""
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Wait until ``amount`` units are available and take them; returns the seconds waited.
+
+        The wait includes time queued behind earlier callers.
+        """
+        # A request bigger than the bucket would wait forever; let it drain the bucket instead
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._level < amount:
+                await asyncio.sleep((amount - self._level) / self.rate)
+                self._refill()
+            self._level -= amount
+        return time.monotonic() - started
+
+    def adjust(self, amount: float):
+        """Give back (positive) or charge (negative) units after the fact; the level may go below zero."""
+        self._refill()
+        self._level = min(self.capacity, self._level + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits; 0 disables a limit."""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int) -> float:
+        waited = 0.0
+        if self.requests is not None:
+            waited += await self.requests.acquire(1)
+        if self.tokens is not None:
+            waited += await self.tokens.acquire(tokens)
+        return waited
+
+    def settle(self, estimated: int, actual: int):
+        if self.tokens is not None and actual != estimated:
+            self.tokens.adjust(estimated - actual)
+
+    def release(self, estimated: int):
+        """Give back a reservation whose call never reached the provider (e.g. a cache hit)."""
+        if self.requests is not None:
+            self.requests.adjust(1)
+        if self.tokens is not None:
+            self.tokens.adjust(estimated)
+
+
+def retryable_errors() -> tuple:
+    """Exception types worth retrying: throttling (429) and transient server errors."""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return (TimeoutError, ConnectionError)
+    return (exceptions.ResourceExhausted, exceptions.TooManyRequests, exceptions.ServiceUnavailable,
+            exceptions.InternalServerError, exceptions.DeadlineExceeded, TimeoutError, ConnectionError)
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 6
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int) -> float:
+        """Full jitter: uniform between 0 and the capped exponential backoff."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+async def with_retries(call, policy: RetryPolicy, errors: tuple | None = None, on_retry=None):
+    """``await call()``, retried on ``errors``; ``on_retry(attempt, error, delay)`` is called before each wait."""
+    errors = errors or retryable_errors()
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except errors as e:
+            if attempt >= policy.max_retries:
+                raise
+            delay = policy.delay(attempt)
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,182 @@
+"""
+Semantic answer cache for RAG chat.
+
+Each entry is (query embedding, ids of the chunks the answer was grounded on,
+answer). A new question whose embedding is within ``threshold`` cosine
+similarity of a cached one gets the cached answer back - no retrieval, no
+generation - provided its chunks still exist. Chunk ids are content
+fingerprints, so "still exists" means "unchanged": re-indexing an edited page
+invalidates every answer built on it.
+
+Entries are keyed on the question alone, so callers should only consult the
+cache for standalone questions (chat.py: the first turn of a session), never
+for follow-ups whose meaning depends on the conversation.
+
+Entries live in SQLite so the cache survives restarts; their vectors are also
+held in memory as one normalized matrix so a lookup is a single mat-vec.
+The cache is bounded by entry count and by stored bytes, evicting the least
+recently used entries first.
+"""
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+
+@dataclass
+class SemanticCacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidated: int = 0
+    evicted: int = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    chunk_ids: list
+    similarity: float
+
+
+class SemanticAnswerCache:
+
+    def __init__(self, path, model: str, threshold: float = 0.95, max_entries: int = 1000,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = SemanticCacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key INTEGER PRIMARY KEY AUTOINCREMENT, model TEXT NOT NULL, query TEXT NOT NULL,"
+            " vector BLOB NOT NULL, chunk_ids TEXT NOT NULL, answer TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT key, vector FROM answers WHERE model = ? ORDER BY key", (self.model,)
+        ).fetchall()
+        self._keys = [key for key, _ in rows]
+        vectors = [np.frombuffer(blob, dtype=np.float32) for _, blob in rows]
+        self._matrix = np.stack(vectors) if vectors else None
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # ------------------------------ lookup ------------------------------
+
+    def lookup(self, query_vector, is_valid=None) -> CachedAnswer | None:
+        """Closest cached answer above ``threshold``.
+
+        ``is_valid(chunk_ids) -> bool`` checks that the grounding chunks are
+        still indexed; an entry that fails it is dropped.
+        """
+        query = self._normalize(query_vector)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                self.stats.misses += 1
+                return None
+            similarities = self._matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.stats.misses += 1
+                return None
+            key = self._keys[best]
+            row = self._conn.execute("SELECT query, chunk_ids, answer FROM answers WHERE key = ?", (key,)).fetchone()
+
+        text, chunk_ids, answer = row[0], json.loads(row[1]), row[2]
+        if is_valid is not None and not is_valid(chunk_ids):
+            with self._lock:
+                self._delete([key])
+                self.stats.invalidated += 1
+                self.stats.misses += 1
+            return None
+
+        with self._lock:
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats.hits += 1
+        return CachedAnswer(query=text, answer=answer, chunk_ids=chunk_ids, similarity=similarity)
+
+    # ------------------------------ writes ------------------------------
+
+    def store(self, query: str, query_vector, chunk_ids: list, answer: str):
+        vector = self._normalize(query_vector)
+        chunk_ids = json.dumps([str(id_) for id_ in chunk_ids])
+        size = vector.nbytes + len(query.encode("utf-8")) + len(chunk_ids) + len(answer.encode("utf-8"))
+        with self._lock:
+            if self._matrix is not None and self._matrix.shape[1] != vector.shape[0]:
+                # Embedding size changed under the same model name: old entries can't be compared
+                self._delete(list(self._keys))
+            cursor = self._conn.execute(
+                "INSERT INTO answers (model, query, vector, chunk_ids, answer, size, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.model, query, vector.tobytes(), chunk_ids, answer, size, time.time()),
+            )
+            self._keys.append(cursor.lastrowid)
+            self._matrix = vector[None, :] if self._matrix is None else np.vstack([self._matrix, vector])
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers WHERE model = ?", (self.model,)
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM answers WHERE model = ? ORDER BY last_used", (self.model,)
+        ):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append(key)
+            count -= 1
+            total -= size
+        self._delete(victims)
+        self.stats.evicted += len(victims)
+
+    def _delete(self, keys: list):
+        if not keys:
+            return
+        self._conn.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+        self._conn.commit()
+        drop = set(keys)
+        keep = [index for index, key in enumerate(self._keys) if key not in drop]
+        self._keys = [self._keys[index] for index in keep]
+        self._matrix = self._matrix[keep] if keep else None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
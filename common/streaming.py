@@ -0,0 +1,74 @@
+"""
+Streamed model output for the chat CLIs.
+
+``send_streaming(chat, message)`` sends with ``stream=True``, prints every
+chunk the moment it arrives and returns the full text together with the
+turn's timing: time to first token (what the user actually waits for) and
+total generation time. ``STREAM_OUTPUT=0`` falls back to a blocking call
+that prints once at the end, with the same timing report.
+"""
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+
+def streaming_enabled() -> bool:
+    return os.getenv("STREAM_OUTPUT", "1") != "0"
+
+
+@dataclass
+class TurnTiming:
+    ttft: float | None
+    total: float
+    chunks: int
+
+    def summary(self) -> str:
+        ttft = f"{self.ttft:.2f}s" if self.ttft is not None else "-"
+        return f"⏱  first token {ttft} · total {self.total:.2f}s"
+
+
+def chunk_text(chunk) -> str:
+    try:
+        return chunk.text or ""
+    except ValueError:
+        # Gemini raises on chunks without text parts (e.g. a bare finish/safety chunk)
+        return ""
+
+
+def render_stream(response, started: float, prefix: str = "🤖 : ", out=None) -> tuple[str, TurnTiming]:
+    """Print a streamed response as it arrives; ``started`` is when the request was sent."""
+    out = out or sys.stdout
+    out.write(prefix)
+    out.flush()
+    parts, ttft = [], None
+    for chunk in response:
+        text = chunk_text(chunk)
+        if not text:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        parts.append(text)
+        out.write(text)
+        out.flush()
+    out.write("\n")
+    return "".join(parts), TurnTiming(ttft=ttft, total=time.perf_counter() - started, chunks=len(parts))
+
+
+def _blocking(call, prefix: str, out=None) -> tuple[str, TurnTiming]:
+    out = out or sys.stdout
+    started = time.perf_counter()
+    text = call().text
+    elapsed = time.perf_counter() - started
+    out.write(f"{prefix}{text}\n")
+    return text, TurnTiming(ttft=elapsed, total=elapsed, chunks=1)
+
+
+def send_streaming(chat, message, prefix: str = "🤖 : ", out=None, **kwargs) -> tuple[str, TurnTiming]:
+    """``chat.send_message`` with the reply rendered token by token (history is updated as usual)."""
+    if not streaming_enabled():
+        return _blocking(lambda: chat.send_message(message, **kwargs), prefix, out)
+    started = time.perf_counter()
+    response = chat.send_message(message, stream=True, **kwargs)
+    return render_stream(response, started, prefix, out)
+
@@ -0,0 +1,163 @@
+"""
+Token counting on top of tiktoken.
+
+``count_tokens`` is the one-off helper used by the chat scripts, while
+``TokenCounter`` streams whole corpora (JSONL, plain text, PDF pages) through
+tiktoken's batch encoder so the Rust BPE runs on several threads at once.
+"""
+import glob
+import json
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-4o"
+TEXT_SUFFIXES = {".txt", ".md", ".rst", ".csv", ".html"}
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """Return (and memoize) the tiktoken encoding for a model or encoding name."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(model)
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Count tokens of a single string. Special-token text is counted as plain text."""
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def batched(iterable, size: int):
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# ------------------------------ corpus readers ------------------------------
+
+def iter_files(paths):
+    """Expand files, directories and glob patterns into supported files."""
+    supported = TEXT_SUFFIXES | JSONL_SUFFIXES | {".pdf"}
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            candidates = sorted(p for p in path.rglob("*") if p.is_file())
+        elif path.exists():
+            candidates = [path]
+        else:
+            # glob.glob, unlike Path.glob, accepts absolute patterns
+            candidates = sorted(Path(match) for match in glob.glob(str(raw), recursive=True))
+        for candidate in candidates:
+            if candidate.suffix.lower() in supported:
+                yield candidate
+
+
+def iter_documents(path: Path, text_key: str = "text"):
+    """Yield the text documents of one file: JSONL records, a text file or PDF pages."""
+    suffix = path.suffix.lower()
+
+    if suffix in JSONL_SUFFIXES:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                text = record.get(text_key) if isinstance(record, dict) else record
+                if isinstance(text, str):
+                    yield text
+
+    elif suffix == ".pdf":
+        from pypdf import PdfReader
+
+        for page in PdfReader(path).pages:
+            yield page.extract_text() or ""
+
+    else:
+        yield path.read_text(encoding="utf-8", errors="replace")
+
+
+# ------------------------------ batch counter ------------------------------
+
+@dataclass
+class CorpusStats:
+    files: int = 0
+    documents: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+    per_file: dict = field(default_factory=dict)
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "documents": self.documents,
+            "tokens": self.tokens,
+            "seconds": round(self.seconds, 3),
+            "tokens_per_second": round(self.tokens_per_second, 1),
+            "per_file": self.per_file,
+        }
+
+
+class TokenCounter:
+    """Count tokens for many documents using tiktoken's threaded batch encoder."""
+
+    def __init__(self, model: str = DEFAULT_MODEL, num_threads: int = 8, batch_size: int = 1024):
+        self.model = model
+        self.encoding = get_encoding(model)
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        """Token counts for ``texts``, encoded across ``num_threads`` threads."""
+        if len(texts) == 1:
+            return [self.count(texts[0])]
+        encoded = self.encoding.encode_ordinary_batch(texts, num_threads=self.num_threads)
+        return [len(tokens) for tokens in encoded]
+
+    def count_iter(self, texts):
+        """Stream token counts for an iterable of texts, one batch in memory at a time."""
+        for batch in batched(texts, self.batch_size):
+            yield from self.count_batch(batch)
+
+    def count_corpus(self, paths, text_key: str = "text", per_file: bool = False) -> CorpusStats:
+        """Count every document found under ``paths`` and time the run."""
+        stats = CorpusStats()
+        start = time.perf_counter()
+
+        file_stats = {}
+
+        def documents():
+            for path in iter_files(paths):
+                stats.files += 1
+                file_stats.setdefault(str(path), {"documents": 0, "tokens": 0})
+                for text in iter_documents(path, text_key=text_key):
+                    yield str(path), text
+
+        # Batches span file boundaries, so a corpus of small files still fills every batch
+        for batch in batched(documents(), self.batch_size):
+            counts = self.count_batch([text for _, text in batch])
+            for (path, _), count in zip(batch, counts):
+                file_stats[path]["documents"] += 1
+                file_stats[path]["tokens"] += count
+                stats.documents += 1
+                stats.tokens += count
+
+        if per_file:
+            stats.per_file = file_stats
+        stats.seconds = time.perf_counter() - start
+        return stats
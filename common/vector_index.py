@@ -0,0 +1,406 @@
+"""
+In-process vector index backed by a memory-mapped NumPy matrix.
+
+Layout of an index directory::
+
+    index.json      dim, dtype, row count, deleted rows and payload indexes
+    vectors.npy     (capacity, dim) float32/float16 matrix, opened with mmap
+    payloads.jsonl  one {"id", "payload"} line per row, append-only
+    codes.npy       int8 / packed-bit codes (only with quantization)
+    scale.npy       int8 calibration (only with int8 quantization)
+
+Vectors are L2-normalised on insert, so a top-k cosine query is a single
+matrix-vector product followed by ``argpartition``. Opening an index maps
+the matrix without reading it, so the vectors cost no load time. The ids and
+payloads are parsed from ``payloads.jsonl`` into memory, though, and payload
+indexes are rebuilt from them, so opening time grows with the row count.
+
+With ``quantization="int8"`` or ``"binary"`` candidates are shortlisted on the
+compact codes and only the shortlisted rows of the full matrix are read to
+rescore them exactly.
+
+Payload fields can be indexed (``"metadata.source": "keyword"``,
+``"metadata.page": "integer"``, the same dotted keys Qdrant uses). A filter on
+indexed fields becomes a row mask without touching the payloads, and a
+selective filter scores only the matching rows, so searching one manual of a
+large collection costs about as much as a collection of that manual alone.
+"""
+import json
+import math
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from common.quantization import check_mode, make_quantizer
+
+INITIAL_CAPACITY = 1024
+SEARCH_BLOCK_ROWS = 65_536
+# Below this fraction of rows a filtered search gathers the allowed rows instead of scoring all of them
+SUBSET_SEARCH_FRACTION = 0.25
+# Allowed rows in runs at least this long on average are read as slices rather than gathered
+MIN_AVERAGE_RUN = 16
+PAYLOAD_SCHEMAS = ("keyword", "integer")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def payload_value(payload: dict, field: str):
+    """Value at a dotted ``field`` path (``"metadata.source"``), None if absent."""
+    for key in field.split("."):
+        if not isinstance(payload, dict):
+            return None
+        payload = payload.get(key)
+    return payload
+
+
+class PayloadIndex:
+    """In-memory index of one payload field.
+
+    ``keyword`` maps each value to its rows; ``integer`` keeps one value per row
+    in a NumPy array so ranges are a vectorised comparison.
+    """
+
+    def __init__(self, field: str, schema: str):
+        if schema not in PAYLOAD_SCHEMAS:
+            raise ValueError(f"Unknown payload index schema {schema!r}; use one of {PAYLOAD_SCHEMAS}.")
+        self.field = field
+        self.schema = schema
+        self._rows: dict = {}
+        self._arrays: dict = {}
+        self._values = np.empty(0, dtype=np.float64)
+
+    def add(self, start: int, payloads: list):
+        values = [payload_value(payload, self.field) for payload in payloads]
+        if self.schema == "keyword":
+            self._arrays.clear()
+            for row, value in enumerate(values, start):
+                for item in value if isinstance(value, list) else [value]:
+                    if item is not None:
+                        self._rows.setdefault(item, []).append(row)
+        else:
+            numbers = [value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+                       for value in values]
+            self._values = np.concatenate([self._values, np.asarray(numbers, dtype=np.float64)])
+
+    def mask(self, condition, count: int) -> np.ndarray | None:
+        """Rows matching ``condition`` (a value, a list of values or a ``gte``/``lte`` range), None if unsupported."""
+        mask = np.zeros(count, dtype=bool)
+        if isinstance(condition, dict):
+            if self.schema != "integer":
+                return None
+            values = self._values[:count]
+            mask[:len(values)] = True
+            for op, compare in (("gte", np.greater_equal), ("gt", np.greater),
+                                ("lte", np.less_equal), ("lt", np.less)):
+                if op in condition:
+                    mask[:len(values)] &= compare(values, condition[op])
+            return mask
+
+        wanted = condition if isinstance(condition, (list, tuple, set)) else [condition]
+        if self.schema == "keyword":
+            for value in wanted:
+                if value not in self._arrays and value in self._rows:
+                    self._arrays[value] = np.asarray(self._rows[value], dtype=np.int64)
+                rows = self._arrays.get(value)
+                if rows is not None:
+                    mask[rows] = True
+        else:
+            values = self._values[:count]
+            mask[:len(values)] = np.isin(values, [value for value in wanted if isinstance(value, (int, float))])
+        return mask
+
+
+class MmapVectorIndex:
+    """Append-only cosine index; upserts tombstone the previous row of an id."""
+
+    def __init__(self, path, dim: int | None = None, dtype: str = "float32", quantization: str | None = None,
+                 oversampling: float = 4.0, payload_indexes: dict | None = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._header_path = self.path / "index.json"
+        self._vectors_path = self.path / "vectors.npy"
+        self._payloads_path = self.path / "payloads.jsonl"
+        self._codes_path = self.path / "codes.npy"
+        self._scale_path = self.path / "scale.npy"
+        self.oversampling = oversampling
+        self._codes = None
+        # Writers may run on several threads (e.g. the ingestion pipeline's upsert workers)
+        self._write_lock = threading.RLock()
+
+        if self._header_path.exists():
+            header = json.loads(self._header_path.read_text())
+            self.dim = header["dim"]
+            self.dtype = np.dtype(header["dtype"])
+            self.count = header["count"]
+            self.quantization = header.get("quantization")
+            schemas = header.get("payload_indexes", {})
+            deleted = header.get("deleted", [])
+            self._matrix = np.load(self._vectors_path, mmap_mode="r+")
+            if self.quantization and self._codes_path.exists():
+                self._codes = np.load(self._codes_path, mmap_mode="r+")
+            self.ids, self.payloads = [], []
+            with open(self._payloads_path, encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    self.ids.append(row["id"])
+                    self.payloads.append(row["payload"])
+            # A crash between the payload append and the header write leaves extra lines behind
+            del self.ids[self.count:], self.payloads[self.count:]
+        else:
+            if dim is None:
+                raise ValueError(f"No index at {self.path}; pass dim to create one.")
+            self.dim = dim
+            self.dtype = np.dtype(dtype)
+            self.count = 0
+            self.quantization = check_mode(quantization)
+            schemas = {}
+            deleted = []
+            self._matrix = None
+            self.ids, self.payloads = [], []
+
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported dtype {self.dtype}; use float32 or float16.")
+
+        self.quantizer = None
+        if self.quantization:
+            scale = np.load(self._scale_path) if self._scale_path.exists() else None
+            self.quantizer = make_quantizer(self.quantization, scale=scale)
+
+        self.alive = np.ones(self.count, dtype=bool)
+        self.alive[deleted] = False
+        self.rows = {id_: row for row, id_ in enumerate(self.ids) if self.alive[row]}
+
+        self.payload_indexes = {}
+        for field, schema in schemas.items():
+            self._build_payload_index(field, schema)
+        for field, schema in (payload_indexes or {}).items():
+            if self.payload_indexes.get(field) is None or self.payload_indexes[field].schema != schema:
+                self.create_payload_index(field, schema)
+
+    # ------------------------------ writes ------------------------------
+
+    def _build_payload_index(self, field: str, schema: str):
+        index = PayloadIndex(field, schema)
+        index.add(0, self.payloads)
+        self.payload_indexes[field] = index
+
+    def create_payload_index(self, field: str, schema: str = "keyword"):
+        """Index a payload field (dotted path) for filtered search; existing rows are indexed too."""
+        with self._write_lock:
+            self._build_payload_index(field, schema)
+            if self._matrix is not None:
+                # A new index gets its header with the first add
+                self.flush()
+
+    def add(self, ids: list, vectors, payloads: list | None = None):
+        """Insert or replace vectors by id."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim}), got {vectors.shape}")
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        payloads = payloads if payloads is not None else [{} for _ in ids]
+
+        with self._write_lock:
+            self.delete([id_ for id_ in ids if id_ in self.rows], flush=False)
+
+            start, end = self.count, self.count + len(ids)
+            self._reserve(end)
+            vectors = normalize(vectors)
+            self._matrix[start:end] = vectors.astype(self.dtype)
+            if self.quantizer:
+                if self.quantizer.scale is None and self.quantization == "int8":
+                    np.save(self._scale_path, self.quantizer.fit(vectors).scale)
+                self._codes[start:end] = self.quantizer.encode(vectors)
+
+            with open(self._payloads_path, "a", encoding="utf-8") as f:
+                for id_, payload in zip(ids, payloads):
+                    f.write(json.dumps({"id": id_, "payload": payload}) + "\n")
+
+            for index in self.payload_indexes.values():
+                index.add(start, payloads)
+            self.ids.extend(ids)
+            self.payloads.extend(payloads)
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            self.rows.update((id_, row) for row, id_ in enumerate(ids, start))
+            self.count = end
+            self.flush()
+
+    def delete(self, ids: list, flush: bool = True) -> int:
+        removed = 0
+        with self._write_lock:
+            for id_ in ids:
+                row = self.rows.pop(id_, None)
+                if row is not None:
+                    self.alive[row] = False
+                    removed += 1
+            if removed and flush:
+                self.flush()
+        return removed
+
+    def _reserve(self, rows: int):
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity * 2, rows)
+        self._matrix = self._grow(self._vectors_path, self._matrix, self.dtype, self.dim, new_capacity)
+        if self.quantizer:
+            width = self.quantizer.code_width(self.dim)
+            self._codes = self._grow(self._codes_path, self._codes, self.quantizer.code_dtype, width, new_capacity)
+
+    def _grow(self, path: Path, current, dtype, width: int, capacity: int):
+        tmp_path = path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(capacity, width))
+        if current is not None:
+            grown[:self.count] = current[:self.count]
+            del current
+        grown.flush()
+        del grown
+        tmp_path.replace(path)
+        return np.load(path, mmap_mode="r+")
+
+    def flush(self):
+        if self._matrix is not None:
+            self._matrix.flush()
+        if self._codes is not None:
+            self._codes.flush()
+        header = {
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "count": self.count,
+            "quantization": self.quantization,
+            "deleted": np.flatnonzero(~self.alive).tolist(),
+            "payload_indexes": {field: index.schema for field, index in self.payload_indexes.items()},
+        }
+        tmp_path = self._header_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(header))
+        tmp_path.replace(self._header_path)
+
+    def compact(self):
+        """Rewrite the matrix and payloads without deleted rows."""
+        keep = np.flatnonzero(self.alive)
+        ids = [self.ids[row] for row in keep]
+        payloads = [self.payloads[row] for row in keep]
+        vectors = np.asarray(self._matrix[keep], dtype=np.float32) if len(keep) else np.empty((0, self.dim), np.float32)
+
+        self._matrix = self._codes = None
+        for path in (self._vectors_path, self._codes_path, self._payloads_path):
+            path.unlink(missing_ok=True)
+        self.count, self.ids, self.payloads = 0, [], []
+        self.alive = np.ones(0, dtype=bool)
+        self.rows = {}
+        self.payload_indexes = {field: PayloadIndex(field, index.schema) for field, index in self.payload_indexes.items()}
+        if ids:
+            self.add(ids, vectors, payloads)
+        else:
+            self.flush()
+
+    # ------------------------------ reads ------------------------------
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, id_):
+        return id_ in self.rows
+
+    def get(self, ids: list) -> list:
+        return [(id_, self.payloads[self.rows[id_]]) for id_ in ids if id_ in self.rows]
+
+    def vectors(self, ids: list) -> np.ndarray:
+        """Stored (normalised) vectors for ``ids`` as float32."""
+        return np.asarray(self._matrix[[self.rows[id_] for id_ in ids]], dtype=np.float32)
+
+    def scores(self, query) -> np.ndarray:
+        """Cosine similarity of ``query`` against every row (deleted rows included)."""
+        if self.count == 0:
+            return np.empty(0, dtype=np.float32)
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        matrix = self._matrix[:self.count]
+        if self.dtype == np.float32:
+            return matrix @ query
+        # NumPy has no BLAS path for float16, so upcast block by block
+        out = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + SEARCH_BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ query
+        return out
+
+    def search(self, query, k: int = 4, mask: np.ndarray | None = None, rescore: bool = True) -> list:
+        """Top-k ``(id, score, payload)`` by cosine similarity, restricted to ``mask`` rows if given."""
+        allowed = self.alive if mask is None else self.alive & mask
+        candidates = int(allowed.sum())
+        k = min(k, candidates)
+        if k <= 0:
+            return []
+        if mask is not None and candidates < SUBSET_SEARCH_FRACTION * self.count:
+            # Selective filter: score only the allowed rows, like searching a collection of just those
+            return self._search_rows(query, k, np.flatnonzero(allowed), rescore)
+
+        if self.quantizer is None:
+            scores = np.where(allowed, self.scores(query), -np.inf)
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            query = normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+            approx = np.where(allowed, self.quantizer.scores(self._codes[:self.count], query), -np.inf)
+            shortlist = min(candidates, math.ceil(k * self.oversampling)) if rescore else k
+            top = np.argpartition(-approx, shortlist - 1)[:shortlist]
+            if rescore:
+                # Exact rescoring only touches the shortlisted rows of the full-precision matrix
+                top = np.sort(top)
+                scores = np.full(self.count, -np.inf, dtype=np.float32)
+                scores[top] = np.asarray(self._matrix[top], dtype=np.float32) @ query
+                top = top[np.argpartition(-scores[top], k - 1)[:k]]
+            else:
+                scores = approx
+
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], float(scores[row]), self.payloads[row]) for row in top]
+
+    def _search_rows(self, query, k: int, rows: np.ndarray, rescore: bool) -> list:
+        """Top-k among ``rows`` (sorted row numbers); reads only those rows of the matrix or codes."""
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+
+        def exact(block):
+            return np.asarray(block, dtype=np.float32) @ query
+
+        if self.quantizer is None or len(rows) <= k:
+            scores = self._score_rows(self._matrix, rows, exact)
+        else:
+            scores = self._score_rows(self._codes, rows, lambda block: self.quantizer.scores(block, query))
+            if rescore:
+                shortlist = min(len(rows), math.ceil(k * self.oversampling))
+                picked = np.sort(np.argpartition(-scores, shortlist - 1)[:shortlist])
+                rows, scores = rows[picked], exact(self._matrix[rows[picked]])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], float(scores[i]), self.payloads[rows[i]]) for i in top]
+
+    @staticmethod
+    def _score_rows(source, rows: np.ndarray, score) -> np.ndarray:
+        """``score`` over ``source[rows]``; contiguous runs (one PDF is written in batches) are read as slices."""
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        if len(rows) < MIN_AVERAGE_RUN * (len(breaks) + 1):
+            return score(source[rows])
+        out = np.empty(len(rows), dtype=np.float32)
+        for start, end in zip([0, *breaks], [*breaks, len(rows)]):
+            out[start:end] = score(source[rows[start]:rows[end - 1] + 1])
+        return out
+
+    def filter_mask(self, conditions: dict) -> np.ndarray | None:
+        """Row mask for ``{field: condition}`` from the payload indexes alone, None if a field isn't indexed."""
+        mask = np.ones(self.count, dtype=bool)
+        for field, condition in conditions.items():
+            index = self.payload_indexes.get(field)
+            field_mask = index.mask(condition, self.count) if index is not None else None
+            if field_mask is None:
+                return None
+            mask &= field_mask
+        return mask
+
+    def payload_mask(self, predicate) -> np.ndarray:
+        """Boolean row mask of payloads for which ``predicate(payload)`` is true."""
+        return np.fromiter((predicate(payload) for payload in self.payloads), dtype=bool, count=self.count)